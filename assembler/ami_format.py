@@ -0,0 +1,232 @@
+import struct
+from typing import Dict, List
+
+#the AMI instruction set and its binary object format (.amo), shared by the assembler, ami_object.py and the compiler,
+#which imports this module from compiler/decaf_absmc.py - it must not depend on PLY
+#
+#header:        magic 'AMIO', u8 version, u32 static data size, u32 label count, u32 block count
+#label table:   u16 name length, utf-8 name, u32 basic block index
+#basic blocks:  u32 instruction count, then per instruction a u8 opcode followed by its operands
+#operands:      register u16 (sap -> 0, a<n> -> 2n + 1, t<n> -> 2n + 2), int i64, float f64, label u32 (index into the label table)
+OBJECT_MAGIC = b'AMIO'
+OBJECT_VERSION = 1
+
+HEADER = struct.Struct('<4sBIII')
+
+#the opcode of an instruction is its position in this list, so new instructions are appended
+OPCODE_NAMES : List[str] = [
+    'move_immed_i',
+    'move_immed_f',
+    'move',
+    'iadd',
+    'isub',
+    'imul',
+    'idiv',
+    'imod',
+    'igt',
+    'igeq',
+    'ilt',
+    'ileq',
+    'fadd',
+    'fsub',
+    'fmul',
+    'fdiv',
+    'fgt',
+    'fgeq',
+    'flt',
+    'fleq',
+    'ftoi',
+    'itof',
+    'bz',
+    'bnz',
+    'jmp',
+    'hload',
+    'hstore',
+    'halloc',
+    'call',
+    'ret',
+    'save',
+    'restore',
+    'iwrite',
+    #single instruction equality and compare-and-branch forms
+    'ieq',
+    'ineq',
+    'beq',
+    'bneq',
+    'blt',
+    'bleq',
+    'bgt',
+    'bgeq',
+    #forms with an integer immediate as the last operand (the offset for hstorei)
+    'iaddi',
+    'imuli',
+    'hloadi',
+    'hstorei',
+    #dynamic dispatch: 'move_immed_l r, L' loads the code address of a label and 'callr r' calls the address in r
+    'move_immed_l',
+    'callr',
+]
+
+OPCODES : Dict[str, int] = {name : opcode for opcode, name in enumerate(OPCODE_NAMES)}
+
+#r = register, i = int immediate, f = float immediate, l = label
+OPERAND_KINDS : Dict[str, str] = {
+    'move_immed_i' : 'ri',
+    'move_immed_f' : 'rf',
+    'move' : 'rr',
+    'ftoi' : 'rr',
+    'itof' : 'rr',
+    'bz' : 'rl',
+    'bnz' : 'rl',
+    'jmp' : 'l',
+    'halloc' : 'rr',
+    'call' : 'l',
+    'ret' : '',
+    'save' : 'r',
+    'restore' : 'r',
+    'iwrite' : 'r',
+    'beq' : 'rrl',
+    'bneq' : 'rrl',
+    'blt' : 'rrl',
+    'bleq' : 'rrl',
+    'bgt' : 'rrl',
+    'bgeq' : 'rrl',
+    'iaddi' : 'rri',
+    'imuli' : 'rri',
+    'hloadi' : 'rri',
+    'hstorei' : 'rir',
+    'move_immed_l' : 'rl',
+    'callr' : 'r',
+}
+
+OPERAND_FORMATS = {'r' : struct.Struct('<H'), 'i' : struct.Struct('<q'), 'f' : struct.Struct('<d'), 'l' : struct.Struct('<I')}
+
+#immediates may still be the strings the compiler generates
+OPERAND_CONVERSIONS = {'i' : int, 'f' : float}
+
+
+class ObjectFormatError(Exception):
+    pass
+
+
+def get_operand_kinds(name : str) -> str:
+    return OPERAND_KINDS.get(name, 'rrr')
+
+def encode_register(register : str) -> int:
+    if register == 'sap':
+        return 0
+    if len(register) < 2 or register[0] not in 'at' or not register[1:].isdigit():
+        raise ObjectFormatError(f'"{register}" is not a register')
+    number = 2 * int(register[1:]) + (1 if register[0] == 'a' else 2)
+    if number > 0xFFFF:
+        raise ObjectFormatError(f'register "{register}" cannot be encoded')
+    return number
+
+def decode_register(number : int) -> str:
+    if number == 0:
+        return 'sap'
+    if number % 2 == 1:
+        return f'a{(number - 1) // 2}'
+    return f't{(number - 2) // 2}'
+
+
+#program is in the format produced by the assembler
+def encode_program(program : Dict) -> bytes:
+
+    labels : Dict[str, int] = program['labels']
+    label_names = list(labels.keys())
+    label_indices = {label : index for index, label in enumerate(label_names)}
+
+    data = [HEADER.pack(OBJECT_MAGIC, OBJECT_VERSION, program['.static_data'], len(label_names), len(program['basic_blocks']))]
+
+    for label in label_names:
+        encoded_label = label.encode('utf-8')
+        data.append(struct.pack('<H', len(encoded_label)) + encoded_label + struct.pack('<I', labels[label]))
+
+    for block in program['basic_blocks']:
+
+        data.append(struct.pack('<I', len(block)))
+
+        for instruction in block:
+
+            if instruction[0] not in OPCODES:
+                raise ObjectFormatError(f'unknown instruction "{instruction[0]}"')
+
+            data.append(struct.pack('<B', OPCODES[instruction[0]]))
+
+            for kind, arg in zip(get_operand_kinds(instruction[0]), instruction[1:]):
+                if kind == 'r':
+                    arg = encode_register(arg)
+                elif kind == 'l':
+                    if arg not in label_indices:
+                        raise ObjectFormatError(f'reference to undefined label "{arg}"')
+                    arg = label_indices[arg]
+                else:
+                    arg = OPERAND_CONVERSIONS[kind](arg)
+                data.append(OPERAND_FORMATS[kind].pack(arg))
+
+    return b''.join(data)
+
+
+#data can be anything supporting the buffer protocol, e.g. bytes or an mmap
+def decode_program(data) -> Dict:
+
+    if len(data) < HEADER.size:
+        raise ObjectFormatError('file is too short to be an AMI object file')
+
+    magic, version, static_data, num_labels, num_blocks = HEADER.unpack_from(data, 0)
+
+    if magic != OBJECT_MAGIC:
+        raise ObjectFormatError('not an AMI object file')
+    if version != OBJECT_VERSION:
+        raise ObjectFormatError(f'unsupported object file version {version}')
+
+    offset = HEADER.size
+
+    try:
+        label_names : List[str] = []
+        labels : Dict[str, int] = {}
+
+        for i in range(num_labels):
+            (length,) = struct.unpack_from('<H', data, offset)
+            offset += 2
+            label = bytes(data[offset : offset + length]).decode('utf-8')
+            offset += length
+            (labels[label],) = struct.unpack_from('<I', data, offset)
+            offset += 4
+            label_names.append(label)
+
+        operand_kinds = [get_operand_kinds(name) for name in OPCODE_NAMES]
+        basic_blocks : List[List[List]] = []
+
+        for i in range(num_blocks):
+            (count,) = struct.unpack_from('<I', data, offset)
+            offset += 4
+            block = []
+
+            for j in range(count):
+                opcode = data[offset]
+                offset += 1
+                if opcode >= len(OPCODE_NAMES):
+                    raise ObjectFormatError(f'unknown opcode {opcode}')
+
+                instruction = [OPCODE_NAMES[opcode]]
+
+                for kind in operand_kinds[opcode]:
+                    operand_format = OPERAND_FORMATS[kind]
+                    (arg,) = operand_format.unpack_from(data, offset)
+                    offset += operand_format.size
+                    if kind == 'r':
+                        arg = decode_register(arg)
+                    elif kind == 'l':
+                        arg = label_names[arg]
+                    instruction.append(arg)
+
+                block.append(instruction)
+
+            basic_blocks.append(block)
+
+    except (struct.error, IndexError):
+        raise ObjectFormatError('truncated or corrupt AMI object file')
+
+    return {'labels' : labels, 'basic_blocks' : basic_blocks, '.static_data' : static_data}
@@ -0,0 +1,806 @@
+import sys
+import json
+import time
+import argparse
+import operator
+from typing import Dict, List, Tuple
+
+
+class MachineError(Exception):
+    pass
+
+
+class ExecutionStats:
+
+    def __init__(self):
+        self.instructions_executed = 0
+        self.wall_time = 0.0
+
+    def __str__(self):
+        return f'instructions executed: {self.instructions_executed}\nwall time: {self.wall_time:.6f}s'
+
+
+#java semantics: the quotient is truncated towards zero
+def integer_divide(a : int, b : int) -> int:
+    if b == 0:
+        raise MachineError("integer division by zero")
+    quotient = abs(a) // abs(b)
+    return quotient if (a < 0) == (b < 0) else -quotient
+
+def integer_modulo(a : int, b : int) -> int:
+    return a - b * integer_divide(a, b)
+
+def float_divide(a : float, b : float) -> float:
+    if b == 0:
+        raise MachineError("float division by zero")
+    return a / b
+
+
+#instructions of the form 'op r1, r2, r3' with r1 := r2 op r3
+ARITHMETIC_OPERATIONS = {
+    'iadd' : operator.add,
+    'isub' : operator.sub,
+    'imul' : operator.mul,
+    'idiv' : integer_divide,
+    'imod' : integer_modulo,
+    'igt' : lambda a, b: int(a > b),
+    'igeq' : lambda a, b: int(a >= b),
+    'ilt' : lambda a, b: int(a < b),
+    'ileq' : lambda a, b: int(a <= b),
+    'ieq' : lambda a, b: int(a == b),
+    'ineq' : lambda a, b: int(a != b),
+    'fadd' : operator.add,
+    'fsub' : operator.sub,
+    'fmul' : operator.mul,
+    'fdiv' : float_divide,
+    'fgt' : lambda a, b: int(a > b),
+    'fgeq' : lambda a, b: int(a >= b),
+    'flt' : lambda a, b: int(a < b),
+    'fleq' : lambda a, b: int(a <= b),
+}
+
+#'op r1, r2, L' branches to L if r1 op r2
+COMPARE_BRANCHES = {
+    'beq' : operator.eq,
+    'bneq' : operator.ne,
+    'blt' : operator.lt,
+    'bleq' : operator.le,
+    'bgt' : operator.gt,
+    'bgeq' : operator.ge,
+}
+
+CONTROL_TRANSFERS = {'bz', 'bnz', 'jmp', 'call', 'callr', 'ret'} | set(COMPARE_BRANCHES)
+
+
+#executes the output of the assembler: {'.static_data' : n, 'labels' : {label : block index}, 'basic_blocks' : [[instruction, ...], ...]}
+#control falls through from the end of one basic block into the next one
+#the code address of a label, loaded by move_immed_l and called by callr, is the index of its basic block plus one, so that
+#an empty cell (0) is never a code address - callr to anything but the address of a label is an error
+class AbstractMachine:
+
+    def __init__(self, program : Dict, out = sys.stdout):
+        self.labels : Dict[str, int] = program['labels']
+        self.basic_blocks : List[List[List]] = program['basic_blocks']
+        self.static_data_size : int = program['.static_data']
+        self.code_addresses = {index + 1 for index in self.labels.values()}
+        self.out = out
+        self.registers : Dict[str, object] = {}
+        self.heap : List = []
+        self.call_stack : List = []
+        self.save_stack : List = []
+        self.reset()
+
+    #the machine state is reset in place so that engines can hold on to the underlying lists
+    def reset(self):
+        self.registers.clear()
+        self.registers['sap'] = 1
+        #address 0 is never allocated so that null never refers to a valid object
+        self.heap[:] = [0] * (1 + self.static_data_size)
+        self.call_stack.clear()
+        self.save_stack.clear()
+        self.stats = ExecutionStats()
+
+    def get_label_index(self, label : str) -> int:
+        if label not in self.labels:
+            raise MachineError(f'undefined label "{label}"')
+        return self.labels[label]
+
+    def allocate(self, size : int) -> int:
+        if size < 0:
+            raise MachineError(f'cannot allocate {size} cells')
+        address = len(self.heap)
+        self.heap.extend([0] * size)
+        return address
+
+    def check_address(self, address : int) -> int:
+        if address <= 0 or address >= len(self.heap):
+            raise MachineError(f'invalid heap address {address}')
+        return address
+
+    def get_code_address(self, label : str) -> int:
+        return self.get_label_index(label) + 1
+
+    #returns the index of the basic block the address refers to
+    def check_code_address(self, address) -> int:
+        if not isinstance(address, int) or address not in self.code_addresses:
+            raise MachineError(f'invalid code address {address}')
+        return address - 1
+
+    def run(self, entry_label : str = '_start') -> ExecutionStats:
+
+        self.reset()
+
+        block_index = self.get_label_index(entry_label)
+        pc = 0
+        count = 0
+
+        start_time = time.perf_counter()
+
+        try:
+            while block_index < len(self.basic_blocks):
+
+                block = self.basic_blocks[block_index]
+
+                if pc >= len(block):
+                    block_index += 1
+                    pc = 0
+                    continue
+
+                instruction = block[pc]
+                pc += 1
+                count += 1
+
+                target = self.execute(instruction, (block_index, pc))
+
+                if target is not None:
+                    if target == -1:
+                        break
+                    block_index, pc = target
+        finally:
+            self.stats.instructions_executed = count
+            self.stats.wall_time = time.perf_counter() - start_time
+
+        return self.stats
+
+    #returns the (block, pc) to continue at, -1 to halt, or None to continue with the next instruction
+    def execute(self, instruction : List, return_address : Tuple[int, int]):
+
+        op = instruction[0]
+        registers = self.registers
+
+        if op in ARITHMETIC_OPERATIONS:
+            registers[instruction[1]] = ARITHMETIC_OPERATIONS[op](registers.get(instruction[2], 0), registers.get(instruction[3], 0))
+
+        elif op == 'move_immed_i':
+            registers[instruction[1]] = int(instruction[2])
+
+        elif op == 'move_immed_f':
+            registers[instruction[1]] = float(instruction[2])
+
+        elif op == 'move':
+            registers[instruction[1]] = registers.get(instruction[2], 0)
+
+        elif op == 'move_immed_l':
+            registers[instruction[1]] = self.get_code_address(instruction[2])
+
+        elif op == 'iaddi':
+            registers[instruction[1]] = registers.get(instruction[2], 0) + int(instruction[3])
+
+        elif op == 'imuli':
+            registers[instruction[1]] = registers.get(instruction[2], 0) * int(instruction[3])
+
+        elif op == 'ftoi':
+            registers[instruction[1]] = int(registers.get(instruction[2], 0))
+
+        elif op == 'itof':
+            registers[instruction[1]] = float(registers.get(instruction[2], 0))
+
+        elif op == 'bz':
+            if registers.get(instruction[1], 0) == 0:
+                return (self.get_label_index(instruction[2]), 0)
+
+        elif op == 'bnz':
+            if registers.get(instruction[1], 0) != 0:
+                return (self.get_label_index(instruction[2]), 0)
+
+        elif op in COMPARE_BRANCHES:
+            if COMPARE_BRANCHES[op](registers.get(instruction[1], 0), registers.get(instruction[2], 0)):
+                return (self.get_label_index(instruction[3]), 0)
+
+        elif op == 'jmp':
+            return (self.get_label_index(instruction[1]), 0)
+
+        elif op == 'hload':
+            registers[instruction[1]] = self.heap[self.check_address(registers.get(instruction[2], 0) + registers.get(instruction[3], 0))]
+
+        elif op == 'hstore':
+            self.heap[self.check_address(registers.get(instruction[1], 0) + registers.get(instruction[2], 0))] = registers.get(instruction[3], 0)
+
+        elif op == 'hloadi':
+            registers[instruction[1]] = self.heap[self.check_address(registers.get(instruction[2], 0) + int(instruction[3]))]
+
+        elif op == 'hstorei':
+            self.heap[self.check_address(registers.get(instruction[1], 0) + int(instruction[2]))] = registers.get(instruction[3], 0)
+
+        elif op == 'halloc':
+            registers[instruction[1]] = self.allocate(registers.get(instruction[2], 0))
+
+        elif op == 'call':
+            self.call_stack.append(return_address)
+            return (self.get_label_index(instruction[1]), 0)
+
+        elif op == 'callr':
+            target = self.check_code_address(registers.get(instruction[1], 0))
+            self.call_stack.append(return_address)
+            return (target, 0)
+
+        elif op == 'ret':
+            if len(self.call_stack) == 0:
+                return -1
+            return self.call_stack.pop()
+
+        elif op == 'save':
+            self.save_stack.append(registers.get(instruction[1], 0))
+
+        elif op == 'restore':
+            if len(self.save_stack) == 0:
+                raise MachineError(f'restore {instruction[1]} with an empty save stack')
+            registers[instruction[1]] = self.save_stack.pop()
+
+        elif op == 'iwrite':
+            print(registers.get(instruction[1], 0), file=self.out)
+
+        else:
+            raise MachineError(f'unknown instruction "{op}"')
+
+        return None
+
+
+
+#every basic block is split after each control transfer and decoded once into closures
+#that operate on a flat register file, so that execution does no string handling at all
+class ClosureMachine(AbstractMachine):
+
+    def __init__(self, program : Dict, out = sys.stdout):
+        self.register_slots : Dict[str, int] = {'sap' : 0}
+        self.register_file : List = []
+        super().__init__(program, out)
+        self.decode()
+
+    def reset(self):
+        super().reset()
+        self.register_file[:] = [0] * len(self.register_slots)
+        self.register_file[self.register_slots['sap']] = 1
+
+    def get_register_slot(self, register : str) -> int:
+        if register not in self.register_slots:
+            self.register_slots[register] = len(self.register_slots)
+        return self.register_slots[register]
+
+    def get_block_start(self, label : str) -> int:
+        return self.block_starts[self.get_label_index(label)]
+
+    #splits every basic block after each control transfer and assigns a slot to every register
+    def split_basic_blocks(self) -> List[List[List]]:
+
+        split_blocks : List[List[List]] = []
+        self.block_starts : List[int] = []
+
+        for block in self.basic_blocks:
+            self.block_starts.append(len(split_blocks))
+            cur = []
+            for instruction in block:
+                cur.append(instruction)
+                if instruction[0] in CONTROL_TRANSFERS:
+                    split_blocks.append(cur)
+                    cur = []
+            if len(cur) > 0 or len(block) == 0:
+                split_blocks.append(cur)
+
+        for block in split_blocks:
+            for instruction in block:
+                for operand in instruction[1:]:
+                    if isinstance(operand, str) and operand not in self.labels:
+                        self.get_register_slot(operand)
+
+        self.register_file[:] = [0] * len(self.register_slots)
+
+        return split_blocks
+
+    def decode(self):
+
+        self.bodies : List[List] = []
+        self.terminators : List = []
+
+        for index, block in enumerate(self.split_basic_blocks()):
+            if len(block) > 0 and block[-1][0] in CONTROL_TRANSFERS:
+                self.bodies.append([self.decode_instruction(i) for i in block[:-1]])
+                self.terminators.append(self.decode_terminator(block[-1], index + 1))
+            else:
+                self.bodies.append([self.decode_instruction(i) for i in block])
+                self.terminators.append(None)
+
+        self.reset()
+
+    def decode_terminator(self, instruction : List, fallthrough : int):
+
+        op = instruction[0]
+        regs = self.register_file
+        call_stack = self.call_stack
+
+        if op == 'bz' or op == 'bnz':
+            reg = self.get_register_slot(instruction[1])
+            target = self.get_block_start(instruction[2])
+
+            if op == 'bz':
+                def run():
+                    return fallthrough if regs[reg] else target
+            else:
+                def run():
+                    return target if regs[reg] else fallthrough
+            return run
+
+        if op in COMPARE_BRANCHES:
+            comparison = COMPARE_BRANCHES[op]
+            left, right = self.get_register_slot(instruction[1]), self.get_register_slot(instruction[2])
+            target = self.get_block_start(instruction[3])
+            def run():
+                return target if comparison(regs[left], regs[right]) else fallthrough
+            return run
+
+        if op == 'jmp':
+            target = self.get_block_start(instruction[1])
+            return lambda: target
+
+        if op == 'call':
+            target = self.get_block_start(instruction[1])
+            push = call_stack.append
+            def run():
+                push(fallthrough)
+                return target
+            return run
+
+        if op == 'callr':
+            reg = self.get_register_slot(instruction[1])
+            block_starts = self.block_starts
+            check_code_address = self.check_code_address
+            push = call_stack.append
+            def run():
+                target = block_starts[check_code_address(regs[reg])]
+                push(fallthrough)
+                return target
+            return run
+
+        #ret
+        def run():
+            return call_stack.pop() if call_stack else -1
+        return run
+
+    def decode_instruction(self, instruction : List):
+
+        op = instruction[0]
+        regs = self.register_file
+        heap = self.heap
+        slot = self.get_register_slot
+
+        if op in ARITHMETIC_OPERATIONS:
+            operation = ARITHMETIC_OPERATIONS[op]
+            dest, left, right = slot(instruction[1]), slot(instruction[2]), slot(instruction[3])
+            def run():
+                regs[dest] = operation(regs[left], regs[right])
+            return run
+
+        if op == 'move_immed_i' or op == 'move_immed_f' or op == 'move_immed_l':
+            dest = slot(instruction[1])
+            if op == 'move_immed_l':
+                value = self.get_code_address(instruction[2])
+            else:
+                value = int(instruction[2]) if op == 'move_immed_i' else float(instruction[2])
+            def run():
+                regs[dest] = value
+            return run
+
+        if op == 'iaddi' or op == 'imuli':
+            dest, src, value = slot(instruction[1]), slot(instruction[2]), int(instruction[3])
+            if op == 'iaddi':
+                def run():
+                    regs[dest] = regs[src] + value
+            else:
+                def run():
+                    regs[dest] = regs[src] * value
+            return run
+
+        if op in ('move', 'ftoi', 'itof'):
+            dest, src = slot(instruction[1]), slot(instruction[2])
+            if op == 'move':
+                def run():
+                    regs[dest] = regs[src]
+            else:
+                conversion = int if op == 'ftoi' else float
+                def run():
+                    regs[dest] = conversion(regs[src])
+            return run
+
+        if op == 'hload':
+            dest, base, offset = slot(instruction[1]), slot(instruction[2]), slot(instruction[3])
+            def run():
+                address = regs[base] + regs[offset]
+                if address <= 0 or address >= len(heap):
+                    raise MachineError(f'invalid heap address {address}')
+                regs[dest] = heap[address]
+            return run
+
+        if op == 'hstore':
+            base, offset, src = slot(instruction[1]), slot(instruction[2]), slot(instruction[3])
+            def run():
+                address = regs[base] + regs[offset]
+                if address <= 0 or address >= len(heap):
+                    raise MachineError(f'invalid heap address {address}')
+                heap[address] = regs[src]
+            return run
+
+        if op == 'hloadi':
+            dest, base, offset = slot(instruction[1]), slot(instruction[2]), int(instruction[3])
+            def run():
+                address = regs[base] + offset
+                if address <= 0 or address >= len(heap):
+                    raise MachineError(f'invalid heap address {address}')
+                regs[dest] = heap[address]
+            return run
+
+        if op == 'hstorei':
+            base, offset, src = slot(instruction[1]), int(instruction[2]), slot(instruction[3])
+            def run():
+                address = regs[base] + offset
+                if address <= 0 or address >= len(heap):
+                    raise MachineError(f'invalid heap address {address}')
+                heap[address] = regs[src]
+            return run
+
+        if op == 'halloc':
+            dest, size = slot(instruction[1]), slot(instruction[2])
+            allocate = self.allocate
+            def run():
+                regs[dest] = allocate(regs[size])
+            return run
+
+        if op == 'save':
+            src = slot(instruction[1])
+            push = self.save_stack.append
+            def run():
+                push(regs[src])
+            return run
+
+        if op == 'restore':
+            dest = slot(instruction[1])
+            save_stack = self.save_stack
+            def run():
+                if len(save_stack) == 0:
+                    raise MachineError(f'restore {instruction[1]} with an empty save stack')
+                regs[dest] = save_stack.pop()
+            return run
+
+        if op == 'iwrite':
+            src = slot(instruction[1])
+            out = self.out
+            def run():
+                print(regs[src], file=out)
+            return run
+
+        raise MachineError(f'unknown instruction "{op}"')
+
+    def run(self, entry_label : str = '_start') -> ExecutionStats:
+
+        self.reset()
+
+        bodies = self.bodies
+        terminators = self.terminators
+        num_blocks = len(bodies)
+
+        index = self.get_block_start(entry_label)
+        count = 0
+
+        start_time = time.perf_counter()
+
+        try:
+            while 0 <= index < num_blocks:
+
+                body = bodies[index]
+                for instruction in body:
+                    instruction()
+
+                terminator = terminators[index]
+                if terminator is None:
+                    count += len(body)
+                    index += 1
+                else:
+                    count += len(body) + 1
+                    index = terminator()
+        finally:
+            self.stats.instructions_executed = count
+            self.stats.wall_time = time.perf_counter() - start_time
+
+        return self.stats
+
+
+#python comparison operators of the compare-and-branch instructions
+COMPARE_BRANCH_SOURCE = {
+    'beq' : '==',
+    'bneq' : '!=',
+    'blt' : '<',
+    'bleq' : '<=',
+    'bgt' : '>',
+    'bgeq' : '>=',
+}
+
+#python source templates for instructions of the form 'op r1, r2, r3'
+ARITHMETIC_SOURCE = {
+    'iadd' : '{0} = {1} + {2}',
+    'isub' : '{0} = {1} - {2}',
+    'imul' : '{0} = {1} * {2}',
+    'idiv' : '{0} = integer_divide({1}, {2})',
+    'imod' : '{0} = integer_modulo({1}, {2})',
+    'igt' : '{0} = 1 if {1} > {2} else 0',
+    'igeq' : '{0} = 1 if {1} >= {2} else 0',
+    'ilt' : '{0} = 1 if {1} < {2} else 0',
+    'ileq' : '{0} = 1 if {1} <= {2} else 0',
+    'ieq' : '{0} = 1 if {1} == {2} else 0',
+    'ineq' : '{0} = 1 if {1} != {2} else 0',
+    'fadd' : '{0} = {1} + {2}',
+    'fsub' : '{0} = {1} - {2}',
+    'fmul' : '{0} = {1} * {2}',
+    'fdiv' : '{0} = float_divide({1}, {2})',
+    'fgt' : '{0} = 1 if {1} > {2} else 0',
+    'fgeq' : '{0} = 1 if {1} >= {2} else 0',
+    'flt' : '{0} = 1 if {1} < {2} else 0',
+    'fleq' : '{0} = 1 if {1} <= {2} else 0',
+}
+
+
+def invalid_address(address):
+    raise MachineError(f'invalid heap address {address}')
+
+
+#every split basic block is translated into the source of a python function that keeps the registers
+#it uses in locals and returns the index of its successor block. Each function is compiled once and
+#the code objects are cached by source, so identical blocks (and repeated loads of a program) share them
+class CompiledMachine(ClosureMachine):
+
+    code_cache : Dict[str, object] = {}
+
+    def decode(self):
+
+        split_blocks = self.split_basic_blocks()
+
+        save_stack = self.save_stack
+
+        def restore_value(register):
+            if len(save_stack) == 0:
+                raise MachineError(f'restore {register} with an empty save stack')
+            return save_stack.pop()
+
+        namespace = {
+            'R' : self.register_file,
+            'heap' : self.heap,
+            'call_stack' : self.call_stack,
+            'push_call' : self.call_stack.append,
+            'pop_call' : self.call_stack.pop,
+            'push_save' : save_stack.append,
+            'restore_value' : restore_value,
+            'allocate' : self.allocate,
+            'out' : self.out,
+            'integer_divide' : integer_divide,
+            'integer_modulo' : integer_modulo,
+            'float_divide' : float_divide,
+            'invalid_address' : invalid_address,
+            'block_starts' : self.block_starts,
+            'check_code_address' : self.check_code_address,
+        }
+
+        self.block_functions : List = []
+        self.block_sizes : List[int] = []
+
+        for index, block in enumerate(split_blocks):
+
+            source = self.generate_block_source(block, index + 1)
+
+            code = CompiledMachine.code_cache.get(source)
+            if code is None:
+                code = compile(source, f'<ami block {index}>', 'exec')
+                CompiledMachine.code_cache[source] = code
+
+            block_namespace = dict(namespace)
+            exec(code, block_namespace)
+
+            self.block_functions.append(block_namespace['block'])
+            self.block_sizes.append(len(block))
+
+        self.reset()
+
+    def generate_block_source(self, block : List[List], fallthrough : int) -> str:
+
+        read_regs : List[int] = []
+        written_regs : List[int] = []
+
+        def use(register : str) -> str:
+            slot = self.register_slots[register]
+            if slot not in read_regs and slot not in written_regs:
+                read_regs.append(slot)
+            return f'r{slot}'
+
+        def define(register : str) -> str:
+            slot = self.register_slots[register]
+            if slot not in written_regs:
+                written_regs.append(slot)
+            return f'r{slot}'
+
+        lines : List[str] = []
+        terminator : List[str] = [f'return {fallthrough}']
+
+        for instruction in block:
+
+            op = instruction[0]
+
+            if op in ARITHMETIC_SOURCE:
+                left, right = use(instruction[2]), use(instruction[3])
+                lines.append(ARITHMETIC_SOURCE[op].format(define(instruction[1]), left, right))
+
+            elif op == 'move_immed_i':
+                lines.append(f'{define(instruction[1])} = {int(instruction[2])!r}')
+
+            elif op == 'move_immed_f':
+                lines.append(f'{define(instruction[1])} = {float(instruction[2])!r}')
+
+            elif op == 'move_immed_l':
+                lines.append(f'{define(instruction[1])} = {self.get_code_address(instruction[2])!r}')
+
+            elif op == 'move':
+                src = use(instruction[2])
+                lines.append(f'{define(instruction[1])} = {src}')
+
+            elif op == 'iaddi' or op == 'imuli':
+                src = use(instruction[2])
+                lines.append(f'{define(instruction[1])} = {src} {"+" if op == "iaddi" else "*"} {int(instruction[3])!r}')
+
+            elif op == 'ftoi' or op == 'itof':
+                src = use(instruction[2])
+                lines.append(f'{define(instruction[1])} = {"int" if op == "ftoi" else "float"}({src})')
+
+            elif op == 'hload':
+                base, offset = use(instruction[2]), use(instruction[3])
+                lines.append(f'address = {base} + {offset}')
+                lines.append('if address <= 0 or address >= len(heap): invalid_address(address)')
+                lines.append(f'{define(instruction[1])} = heap[address]')
+
+            elif op == 'hstore':
+                base, offset, src = use(instruction[1]), use(instruction[2]), use(instruction[3])
+                lines.append(f'address = {base} + {offset}')
+                lines.append('if address <= 0 or address >= len(heap): invalid_address(address)')
+                lines.append(f'heap[address] = {src}')
+
+            elif op == 'hloadi':
+                base = use(instruction[2])
+                lines.append(f'address = {base} + {int(instruction[3])!r}')
+                lines.append('if address <= 0 or address >= len(heap): invalid_address(address)')
+                lines.append(f'{define(instruction[1])} = heap[address]')
+
+            elif op == 'hstorei':
+                base, src = use(instruction[1]), use(instruction[3])
+                lines.append(f'address = {base} + {int(instruction[2])!r}')
+                lines.append('if address <= 0 or address >= len(heap): invalid_address(address)')
+                lines.append(f'heap[address] = {src}')
+
+            elif op == 'halloc':
+                size = use(instruction[2])
+                lines.append(f'{define(instruction[1])} = allocate({size})')
+
+            elif op == 'save':
+                lines.append(f'push_save({use(instruction[1])})')
+
+            elif op == 'restore':
+                lines.append(f'{define(instruction[1])} = restore_value({instruction[1]!r})')
+
+            elif op == 'iwrite':
+                lines.append(f'print({use(instruction[1])}, file=out)')
+
+            elif op == 'bz' or op == 'bnz':
+                reg = use(instruction[1])
+                target = self.get_block_start(instruction[2])
+                if op == 'bz':
+                    terminator = [f'return {fallthrough} if {reg} else {target}']
+                else:
+                    terminator = [f'return {target} if {reg} else {fallthrough}']
+
+            elif op in COMPARE_BRANCH_SOURCE:
+                left, right = use(instruction[1]), use(instruction[2])
+                target = self.get_block_start(instruction[3])
+                terminator = [f'return {target} if {left} {COMPARE_BRANCH_SOURCE[op]} {right} else {fallthrough}']
+
+            elif op == 'jmp':
+                terminator = [f'return {self.get_block_start(instruction[1])}']
+
+            elif op == 'call':
+                terminator = [f'push_call({fallthrough})', f'return {self.get_block_start(instruction[1])}']
+
+            elif op == 'callr':
+                terminator = [f'target = block_starts[check_code_address({use(instruction[1])})]', f'push_call({fallthrough})', 'return target']
+
+            elif op == 'ret':
+                terminator = ['return pop_call() if call_stack else -1']
+
+            else:
+                raise MachineError(f'unknown instruction "{op}"')
+
+        source = ['def block(R=R, heap=heap, call_stack=call_stack):']
+        source.extend(f'    r{slot} = R[{slot}]' for slot in read_regs)
+        source.extend(f'    {line}' for line in lines)
+        source.extend(f'    R[{slot}] = r{slot}' for slot in written_regs)
+        source.extend(f'    {line}' for line in terminator)
+
+        return '\n'.join(source) + '\n'
+
+    def run(self, entry_label : str = '_start') -> ExecutionStats:
+
+        self.reset()
+
+        functions = self.block_functions
+        sizes = self.block_sizes
+        num_blocks = len(functions)
+
+        index = self.get_block_start(entry_label)
+        count = 0
+
+        start_time = time.perf_counter()
+
+        try:
+            while 0 <= index < num_blocks:
+                count += sizes[index]
+                index = functions[index]()
+        finally:
+            self.stats.instructions_executed = count
+            self.stats.wall_time = time.perf_counter() - start_time
+
+        return self.stats
+
+
+ENGINES = {
+    'reference' : AbstractMachine,
+    'closure' : ClosureMachine,
+    'compiled' : CompiledMachine,
+}
+
+
+def load_program(file_name : str) -> Dict:
+
+    if file_name.endswith('.json'):
+        with open(file_name, 'r') as infile:
+            return json.load(infile)
+
+    #binary object files and AMI text need the assembler
+    import ami_object
+    try:
+        return ami_object.load_program(file_name)
+    except ami_object.ObjectFormatError as e:
+        raise MachineError(str(e))
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Executes assembled AMI programs")
+
+    parser.add_argument("--infile", type=str, required=True, help="assembled program (.json), binary object file (.amo) or AMI source (.ami)")
+    parser.add_argument("--entry", type=str, default="_start", help="label at which execution starts")
+    parser.add_argument("--engine", choices=list(ENGINES), default="closure", help="execution engine - 'reference' decodes every instruction as it runs")
+    parser.add_argument("--stats", action="store_true", help="print the instruction count and wall time to stderr")
+
+    args = parser.parse_args()
+
+    try:
+        machine = ENGINES[args.engine](load_program(args.infile))
+        stats = machine.run(args.entry)
+    except (OSError, MachineError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.stats:
+        print(stats, file=sys.stderr)
@@ -0,0 +1,84 @@
+import os
+import sys
+import json
+import mmap
+import argparse
+from typing import Dict, List
+
+import assembler
+from ami_format import ObjectFormatError, encode_program, decode_program
+
+
+#reading and writing .amo files - the format itself is defined in ami_format.py
+
+
+def read_object_file(file_name : str) -> Dict:
+    with open(file_name, 'rb') as infile:
+        if infile.seek(0, 2) == 0:
+            return decode_program(b'')
+        with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return decode_program(data)
+
+
+#writes the program back out as AMI text that the assembler accepts
+def print_program(program : Dict, file):
+
+    block_labels : Dict[int, List[str]] = {}
+    for label, index in program['labels'].items():
+        block_labels.setdefault(index, []).append(label)
+
+    file.write(f'.static_data {program[".static_data"]}\n\n')
+
+    for index, block in enumerate(program['basic_blocks']):
+        for label in block_labels.get(index, []):
+            file.write(f'{label}:\n')
+        for instruction in block:
+            file.write(f'{instruction[0]} {", ".join(map(str, instruction[1:]))}'.rstrip() + '\n')
+
+
+def load_program(file_name : str) -> Dict:
+
+    if file_name.endswith('.amo'):
+        return read_object_file(file_name)
+
+    with open(file_name, 'r') as infile:
+        data = infile.read()
+
+    if file_name.endswith('.ami'):
+        program = assembler.parser.parse(data, lexer=assembler.lexer)
+        if program == None:
+            raise ObjectFormatError(f'could not assemble {file_name}')
+        return program
+
+    return json.loads(data)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Converts between AMI text (.ami), assembled JSON (.json) and binary AMI object files (.amo)")
+
+    parser.add_argument("--infile", type=str, required=True, help="program to convert")
+    parser.add_argument("--outfile", type=str, help="output file - the format is chosen by its extension, defaults to .amo (or .ami for .amo input)")
+
+    args = parser.parse_args()
+
+    outfile = args.outfile
+    if outfile == None:
+        outfile = os.path.splitext(args.infile)[0] + ('.ami' if args.infile.endswith('.amo') else '.amo')
+
+    try:
+        program = load_program(args.infile)
+
+        if outfile.endswith('.amo'):
+            with open(outfile, 'wb') as out:
+                out.write(encode_program(program))
+        elif outfile.endswith('.json'):
+            with open(outfile, 'w') as out:
+                json.dump(program, out)
+        else:
+            with open(outfile, 'w') as out:
+                print_program(program, out)
+
+    except (OSError, ObjectFormatError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
@@ -3,42 +3,10 @@ import ply.yacc as yacc
 import sys
 import json
 import argparse
+import ami_format
 
-reserved = {
-    'move_immed_i' : 'MOVE_IMMED_I',
-    'move_immed_f' : 'MOVE_IMMED_F',
-    'move' : 'MOVE',
-    'iadd' : 'IADD',
-    'isub' : 'ISUB',
-    'imul' : 'IMUL',
-    'idiv' : 'IDIV',
-    'imod' : 'IMOD',
-    'igt' : 'IGT',
-    'igeq' : 'IGEQ',
-    'ilt' : 'ILT' ,
-    'ileq' : 'ILEQ',
-    'fadd' : 'FADD',
-    'fsub' : 'FSUB',
-    'fmul' : 'FMUL',
-    'fdiv' : 'FDIV',
-    'fgt' : 'FGT',
-    'fgeq' : 'FGEQ',
-    'flt' : 'FLT' ,
-    'fleq' : 'FLEQ',
-    'ftoi' : 'FTOI',
-    'itof' : 'ITOF',
-    'bz' : 'BZ' ,
-    'bnz' : 'BNZ', 
-    'jmp' : 'JMP',
-    'hload' : 'HLOAD', 
-    'hstore' : 'HSTORE',
-    'halloc' : 'HALLOC',
-    'call' : 'CALL',
-    'ret' : 'RET' ,
-    'save' : 'SAVE',
-    'restore' : 'RESTORE',
-    'iwrite' : 'IWRITE',
-}
+#every instruction is a reserved word whose token is its name in upper case
+reserved = {name : name.upper() for name in ami_format.OPCODE_NAMES}
 
 tokens = [
     'STATICDATA',
@@ -62,35 +30,28 @@ t_ignore  = ' \t'
 t_COMMA = r','
 
 def t_REGISTER(t):
-    r'(a|t)[0-9]+'
+    r'(?:sap|(?:a|t)[0-9]+)(?![a-zA-Z0-9_])'
     return t
 
 def t_LABEL(t):
     r'[a-zA-Z_][a-zA-Z0-9_]*:'
     return t
 
+#anything that is not an instruction name is a reference to a label
 def t_INSTRUCTION(t):
-    r'[a-z_]+'
-    a = reserved.get(t.value, None)
-    if a == None:
-        raise Exception(f'{t.value}')
-    t.type = reserved.get(t.value, None)
+    r'[a-zA-Z_][a-zA-Z0-9_]*'
+    t.type = reserved.get(t.value, 'LABELREFERENCE')
 
     return t
 
 
-def t_LABELREFERENCE(t):
-    r'[a-zA-Z][a-zA-Z0-9_]*'
-    return t
-
-
 def t_FLOATLITERAL(t):
-    r'[0-9]+\.[0-9]'
+    r'-?[0-9]+\.[0-9]+'
     t.value = float(t.value)
     return t
 
 def t_INTLITERAL(t):
-    r'\d+'
+    r'-?\d+'
     t.value = int(t.value)
     return t
 
@@ -207,6 +168,8 @@ def p_tertiary_instruction(p):
         | IGEQ tertiary_reg_list
         | ILT tertiary_reg_list
         | ILEQ tertiary_reg_list
+        | IEQ tertiary_reg_list
+        | INEQ tertiary_reg_list
         | FADD tertiary_reg_list
         | FSUB tertiary_reg_list
         | FMUL tertiary_reg_list
@@ -226,13 +189,36 @@ def p_binary_reg_list(p):
 
 def p_binary_instruction(p):
     '''binary_instruction : HALLOC binary_reg_list
-        | BNZ binary_reg_list
-        | BZ binary_reg_list
         | ITOF binary_reg_list
         | FTOI binary_reg_list
         | MOVE binary_reg_list '''
     p[0] = [p[1]] + p[2]
     
+def p_branch_instruction(p):
+    '''binary_instruction : BNZ REGISTER COMMA LABELREFERENCE
+        | BZ REGISTER COMMA LABELREFERENCE'''
+    p[0] = [p[1], p[2], p[4]]
+
+def p_label_address_instruction(p):
+    '''binary_instruction : MOVE_IMMED_L REGISTER COMMA LABELREFERENCE'''
+    p[0] = [p[1], p[2], p[4]]
+
+def p_compare_branch_instruction(p):
+    '''tertiary_instruction : BEQ REGISTER COMMA REGISTER COMMA LABELREFERENCE
+        | BNEQ REGISTER COMMA REGISTER COMMA LABELREFERENCE
+        | BLT REGISTER COMMA REGISTER COMMA LABELREFERENCE
+        | BLEQ REGISTER COMMA REGISTER COMMA LABELREFERENCE
+        | BGT REGISTER COMMA REGISTER COMMA LABELREFERENCE
+        | BGEQ REGISTER COMMA REGISTER COMMA LABELREFERENCE'''
+    p[0] = [p[1], p[2], p[4], p[6]]
+
+def p_immediate_instruction(p):
+    '''tertiary_instruction : IADDI REGISTER COMMA REGISTER COMMA INTLITERAL
+        | IMULI REGISTER COMMA REGISTER COMMA INTLITERAL
+        | HLOADI REGISTER COMMA REGISTER COMMA INTLITERAL
+        | HSTOREI REGISTER COMMA INTLITERAL COMMA REGISTER'''
+    p[0] = [p[1], p[2], p[4], p[6]]
+    
 def p_binary_instruction_(p):
     '''binary_instruction :  MOVE_IMMED_I REGISTER COMMA INTLITERAL
         | MOVE_IMMED_F REGISTER COMMA FLOATLITERAL '''
@@ -243,6 +229,7 @@ def p_unary_instruction(p):
         | SAVE REGISTER
         | CALL LABELREFERENCE
         | JMP LABELREFERENCE
+        | CALLR REGISTER
         | IWRITE REGISTER'''
     p[0] = [p[1], p[2]]
 
@@ -1,45 +1,56 @@
-
+import os
+import sys
 from enum import Enum
 from typing import Dict, Tuple, List
 
+#the instruction set and the object format are defined once, next to the assembler
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'assembler'))
+import ami_format
 
-class Instruction(Enum):
-    MOVE_IMMED_I = "move_immed_i"
-    MOVE_IMMED_F = "move_immed_f"
-    MOVE = "move"
-    IADD = "iadd"
-    ISUB = "isub"
-    IMUL = "imul"
-    IDIV = "idiv"
-    IMOD = "imod"
-    IGT = "igt"
-    IGEQ = "igeq"
-    ILT = "ilt"
-    ILEQ = "ileq"
-    FADD = "fadd"
-    FSUB = "fsub"
-    FMUL = "fmul"
-    FDIV = "fdiv"
-    FGT = "fgt"
-    FGEQ = "fgeq"
-    FLT = "flt"
-    FLEQ = "fleq"
-    FTOI = "ftoi"
-    ITOF = "itof"
-    BZ = "bz"
-    BNZ = "bnz"
-    JMP = "jmp"
-    HLOAD = "hload"
-    HSTORE = "hstore"
-    HALLOC = "halloc"
-    CALL = "call"
-    RET = "ret"
-    SAVE = "save"
-    RESTORE = "restore"
-    
-    IWRITE = 'iwrite'
-    
 
+#Instruction.MOVE_IMMED_I = 'move_immed_i', and so on for every instruction the assembler knows
+Instruction = Enum('Instruction', [(name.upper(), name) for name in ami_format.OPCODE_NAMES])
+
+#operand kinds: r = register, i = int immediate, f = float immediate, l = label
+def get_operand_kinds(instruction : Instruction) -> str:
+    return ami_format.get_operand_kinds(instruction.value)
+
+#instructions whose first operand is a register that is read rather than written
+READS_FIRST_OPERAND = {Instruction.HSTORE, Instruction.HSTOREI, Instruction.BZ, Instruction.BNZ, Instruction.SAVE, Instruction.IWRITE,
+                       Instruction.BEQ, Instruction.BNEQ, Instruction.BLT, Instruction.BLEQ, Instruction.BGT, Instruction.BGEQ, Instruction.CALLR}
+
+#calls to a label and through a register - both write the result to a0 and clobber every register the caller did not save
+CALLS = {Instruction.CALL, Instruction.CALLR}
+
+#branches that fall through when not taken - their target label is always the last operand
+#'bz r, L' / 'bnz r, L' test a register against zero, the others compare two registers
+CONDITIONAL_BRANCHES = {Instruction.BZ, Instruction.BNZ, Instruction.BEQ, Instruction.BNEQ,
+                        Instruction.BLT, Instruction.BLEQ, Instruction.BGT, Instruction.BGEQ}
+
+#the branch taken exactly when the given one is not
+INVERTED_BRANCHES : Dict[Instruction, Instruction] = {
+    Instruction.BZ : Instruction.BNZ,
+    Instruction.BNZ : Instruction.BZ,
+    Instruction.BEQ : Instruction.BNEQ,
+    Instruction.BNEQ : Instruction.BEQ,
+    Instruction.BLT : Instruction.BGEQ,
+    Instruction.BGEQ : Instruction.BLT,
+    Instruction.BGT : Instruction.BLEQ,
+    Instruction.BLEQ : Instruction.BGT,
+}
+
+def is_label_entry(instruction_tuple) -> bool:
+    return isinstance(instruction_tuple[0], str)
+
+def get_registers_written(instruction : Instruction, args : List[str]) -> List[str]:
+    kinds = get_operand_kinds(instruction)
+    if len(kinds) == 0 or kinds[0] != 'r' or instruction in READS_FIRST_OPERAND:
+        return []
+    return [args[0]]
+
+def get_registers_read(instruction : Instruction, args : List[str]) -> List[str]:
+    kinds = get_operand_kinds(instruction)
+    return [arg for index, (kind, arg) in enumerate(zip(kinds, args)) if kind == 'r' and (index > 0 or instruction in READS_FIRST_OPERAND)]
 
 
 
@@ -85,6 +96,76 @@ class AbstractProgram:
         
     
     
+    #removes the sections that are not reached from the entry labels through calls, jumps and loaded code addresses,
+    #and the groups left empty
+    #returns the labels of the removed sections
+    def remove_unreferenced_sections(self, entry_labels : List[str]) -> List[str]:
+        
+        reached = set(label for label in entry_labels if label in self.labels_to_sections_map)
+        worklist = list(reached)
+        
+        while len(worklist) > 0:
+            for instruction_tuple in self.labels_to_sections_map[worklist.pop()]:
+                if is_label_entry(instruction_tuple):
+                    continue
+                for kind, arg in zip(get_operand_kinds(instruction_tuple[0]), instruction_tuple[1]):
+                    if kind == 'l' and arg in self.labels_to_sections_map and arg not in reached:
+                        reached.add(arg)
+                        worklist.append(arg)
+        
+        removed = [label for label in self.labels_to_sections_map if label not in reached]
+        
+        for label in removed:
+            del self.labels_to_sections_map[label]
+        
+        for group_name in list(self.label_groups):
+            text, labels = self.label_groups[group_name]
+            labels[:] = [label for label in labels if label in reached]
+            if len(labels) == 0:
+                del self.label_groups[group_name]
+        
+        return removed
+    
+    #groups the sections the same way the assembler does: every run of labels starts a new basic block
+    #returns the map from label to basic block index and the basic blocks as lists of [name, args...]
+    def get_basic_blocks(self) -> Tuple[Dict[str, int], List[List[List]]]:
+        
+        labels : Dict[str, int] = {}
+        basic_blocks : List[List[List]] = []
+        pending_labels : List[str] = []
+        
+        for group in self.label_groups.values():
+            for label_name in group[1]:
+                
+                pending_labels.append(label_name)
+                
+                for instruction_tuple in self.labels_to_sections_map[label_name]:
+                    
+                    if isinstance(instruction_tuple[0], str):
+                        pending_labels.append(instruction_tuple[0][:-1])
+                        continue
+                    
+                    if len(pending_labels) > 0 or len(basic_blocks) == 0:
+                        for label in pending_labels:
+                            labels[label] = len(basic_blocks)
+                        pending_labels = []
+                        basic_blocks.append([])
+                    
+                    basic_blocks[-1].append([instruction_tuple[0].value] + list(instruction_tuple[1]))
+        
+        for label in pending_labels:
+            labels[label] = len(basic_blocks)
+        
+        return (labels, basic_blocks)
+    
+    
+    def write_object_file(self, file):
+        
+        labels, basic_blocks = self.get_basic_blocks()
+        
+        file.write(ami_format.encode_program({'labels' : labels, 'basic_blocks' : basic_blocks, '.static_data' : self.cur_static_data_offset}))
+    
+    
     def print_to_file(self, file):
     
         file.write(f'.static_data {self.cur_static_data_offset}\n\n')
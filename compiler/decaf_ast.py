@@ -1,6 +1,6 @@
 import sys
 import decaf_typecheck
-from typing import List, Tuple, Optional, Dict
+from typing import List, Tuple, Optional, Dict, Set, FrozenSet
 from enum import Enum
 
 
@@ -88,7 +88,7 @@ class Variable_Declaration:
         self.name = name
         
         if data_type not in type_name_map:
-            self.type = decaf_typecheck.ClassObjectType(data_type)
+            self.type = decaf_typecheck.get_class_object_type(data_type)
         else:
             self.type = type_name_map[data_type]
 
@@ -696,7 +696,7 @@ class Unary_Expression:
 
     def compute_type(self, ast, cur_class):
 
-        if self.operation == 'uminus':
+        if self.operation == Operation.UMINUS:
             if self.expression.compute_type(ast, cur_class) in [decaf_typecheck.BaseType.INT, decaf_typecheck.BaseType.FLOAT]:
                 self.type = self.expression.compute_type(ast, cur_class)
                 return self.expression.compute_type(ast, cur_class)
@@ -885,7 +885,7 @@ class Constructor_Record:
             if param[0] in type_name_map:
                 params_to_type[param[1]] = type_name_map[param[0]]
             else:
-                params_to_type[param[1]] = decaf_typecheck.ClassObjectType(param[0])
+                params_to_type[param[1]] = decaf_typecheck.get_class_object_type(param[0])
             
       
 
@@ -961,7 +961,7 @@ class Method_Record:
         if return_type in type_name_map:
             self.return_type = type_name_map[return_type]
         else:
-            self.return_type = decaf_typecheck.ClassObjectType(return_type)
+            self.return_type = decaf_typecheck.get_class_object_type(return_type)
         
         #self.return_type = return_type
         self.body = body
@@ -1002,7 +1002,7 @@ class Method_Record:
             if param[0] in type_name_map:
                 params_to_type[param[1]] = type_name_map[param[0]]
             else:
-                params_to_type[param[1]] = decaf_typecheck.ClassObjectType(param[0])
+                params_to_type[param[1]] = decaf_typecheck.get_class_object_type(param[0])
             
 
         for var_name, var_object_array in body.get_var_names_to_resolve().items():
@@ -1042,29 +1042,28 @@ class Class_Record:
         return res
 
     def get_field_id_from_name(self, field_name : str) -> Optional[int]:
-        for field in self.fields:
-            if field.name == field_name:
-                return field.id
-        return None
+        field = self.fields_by_name.get(field_name)
+        if field == None:
+            return None
+        return field.id
         
     def get_field_from_name(self, field_name : str):
-        for field in self.fields:
-            if field.name == field_name:
-                return field
-            
-        return None
+        return self.fields_by_name.get(field_name)
+    
+    #fields and methods declared in the class or inherited from any of its superclasses, the nearest declaration wins
+    #only available once AST.resolve_inheritance has run
+    def get_visible_field(self, field_name : str):
+        return self.visible_fields.get(field_name)
+    
+    def get_visible_method(self, method_name : str):
+        return self.visible_methods.get(method_name)
 
 
     def get_name(self):
         return self.class_name
     
     def get_method_from_name(self, method_name : str):
-        
-        for record in self.methods:
-            if record.name == method_name:
-                return record
-                
-        return None
+        return self.methods_by_name.get(method_name)
     
     def get_constructor(self):
         if len(self.constructors) == 0:
@@ -1072,23 +1071,18 @@ class Class_Record:
         
         return self.constructors[0]
     
-    def get_constructor_record(self, id : int) -> Optional[Constructor_Record]:
-        for constructor in self.constructors:
-            if constructor.id == id:
-                return constructor
-        return None
-    
-    #can find constructors and methods - -1 if not found
+    #can find constructors and methods - None if not found
     def get_id_from_method_name(self, method_name : str) -> Optional[int]:
         
         if method_name == self.class_name and len(self.constructors) > 0:
             return self.constructors[0].id
         
-        for method in self.methods:
-            if method_name == method.name:
-                return method.id
-            
-        return None
+        method = self.methods_by_name.get(method_name)
+        
+        if method == None:
+            return None
+        
+        return method.id
 
     def __init__(self, class_name):
         pass
@@ -1108,6 +1102,11 @@ class Class_Record:
         self.constructors : List[Constructor_Record] = []
         self.fields : List[Field_Record] = []
         self.methods : List[Method_Record] = []
+        #the first declaration of a name is the one found by name
+        self.fields_by_name : Dict[str, Field_Record] = {}
+        self.methods_by_name : Dict[str, Method_Record] = {}
+        self.visible_fields : Dict[str, Field_Record] = {}
+        self.visible_methods : Dict[str, Method_Record] = {}
         self.instance_field_count = 0
         self.create_class_data(class_body_elements)
         
@@ -1122,6 +1121,19 @@ class Class_Record:
                 return False
         return True
 
+    def add_field(self, field):
+        
+        field.set_containing_class(self.class_name)
+        
+        if field.get_name() in self.fields_by_name:
+            print(f'ERROR: repeating field name {field.get_name()}')
+            #sys.exit()
+        
+        self.fields.append(field)
+        self.fields_by_name.setdefault(field.name, field)
+        if field.applicability == 'instance':
+            self.instance_field_count += 1
+
     def create_class_data(self, class_body_elements):
 
         for element in class_body_elements:
@@ -1130,17 +1142,7 @@ class Class_Record:
                 
                 for list_element in element:
                     if isinstance(list_element, Field_Record):
-                        list_element.set_containing_class(self.class_name)
-
-                        for i in self.fields:
-                        
-                            if i.get_name() == list_element.get_name():
-                                print(f'ERROR: repeating field name {i.get_name()}')
-                                #sys.exit()
-
-                        self.fields.append(list_element)
-                        if list_element.applicability == 'instance':
-                            self.instance_field_count += 1
+                        self.add_field(list_element)
                 
                 
             
@@ -1150,28 +1152,19 @@ class Class_Record:
                 
                 this_expressions = element.get_this_expressions_to_resolve()
                 for this_expr in this_expressions:
-                    this_expr.set_type(decaf_typecheck.ClassObjectType(self.class_name))
+                    this_expr.set_type(decaf_typecheck.get_class_object_type(self.class_name))
 
             if isinstance(element, Field_Record):
-                element.set_containing_class(self.class_name)
-
-                for i in self.fields:
-                    
-                    if i.get_name() == element.get_name():
-                        print(f'ERROR: repeating field name {i.get_name()}')
-                        #sys.exit()
-
-                self.fields.append(element)
-                if element.applicability == 'instance':
-                    self.instance_field_count += 1
+                self.add_field(element)
 
             if isinstance(element, Method_Record):
                 element.set_containing_class(self.class_name)
                 self.methods.append(element)
+                self.methods_by_name.setdefault(element.name, element)
                 
                 this_expressions = element.get_this_expressions_to_resolve()
                 for this_expr in this_expressions:
-                    this_expr.set_type(decaf_typecheck.ClassObjectType(self.class_name))
+                    this_expr.set_type(decaf_typecheck.get_class_object_type(self.class_name))
 
 
 
@@ -1240,7 +1233,7 @@ class Field_Record:
         #    self.data_type = type_name_map[data_type]
         #else:
         #    print(f'not: |{data_type}| {data_type == "int" } {type(data_type)}')
-        #    self.data_type = decaf_typecheck.ClassObjectType(data_type)
+        #    self.data_type = decaf_typecheck.get_class_object_type(data_type)
         
         self.data_type = data_type
         
@@ -1257,12 +1250,12 @@ class New_Object_Expression:
         
         if constructor.visibility == 'private':
             if cur_class == self.class_name:
-                self.type = decaf_typecheck.ClassObjectType(self.class_name)
+                self.type = decaf_typecheck.get_class_object_type(self.class_name)
             else:
                 self.type = decaf_typecheck.BaseType.ERROR
                 
         else:
-            self.type = decaf_typecheck.ClassObjectType(self.class_name)
+            self.type = decaf_typecheck.get_class_object_type(self.class_name)
             
         return self.type
     
@@ -1355,25 +1348,12 @@ class Method_Call_Expression:
         
         
         
-        method_record =  class_record.get_method_from_name(self.method_name)
-        
-        
+        method_record = class_record.get_visible_method(self.method_name)
         
         if method_record == None:
-            
-            if class_record.super_class_name != None:
-                super_class_record = ast.get_class_record(class_record.super_class_name)
-                
-                method_record = super_class_record.get_method_from_name(self.method_name)
-            
-                if method_record == None:
-            
-                    print_error_msg("ERROR method does not exist")
-                    self.type = decaf_typecheck.BaseType.ERROR
-                    return self.type
-            else:
-                self.type = decaf_typecheck.BaseType.ERROR
-                return self.type
+            print_error_msg("ERROR method does not exist")
+            self.type = decaf_typecheck.BaseType.ERROR
+            return self.type
             
         if method_record.get_param_count() != len(self.arguments):
             print("not correct number of args")
@@ -1384,11 +1364,12 @@ class Method_Call_Expression:
         
         
         if self.type not in [decaf_typecheck.BaseType.INT, decaf_typecheck.BaseType.BOOL, decaf_typecheck.BaseType.FLOAT]:
-            self.type = decaf_typecheck.ClassObjectType(self.type)
+            self.type = decaf_typecheck.get_class_object_type(self.type)
             
         
         
         self.method_id = method_record.get_id()
+        self.receiver_class_name = class_record.class_name
         
         for arg in self.arguments:
             if arg.compute_type(ast, cur_class) == False:
@@ -1412,6 +1393,7 @@ class Method_Call_Expression:
         self.base_expression = base_expression
         self.method_name = method_name
         self.arguments = arguments
+        self.receiver_class_name = None
         
 
     def __str__(self):
@@ -1476,7 +1458,7 @@ class Class_Reference_Expression:
     
     def __init__(self, class_name : str):
         self.class_name = class_name
-        self.type = decaf_typecheck.ClassLiteralType(class_name)
+        self.type = decaf_typecheck.get_class_literal_type(class_name)
         
     def __str__(self):
         return f'class-literal({self.class_name})'
@@ -1553,6 +1535,56 @@ class WriteStatement:
         return f'_write({self.data})'
 
 
+#every object starts with the address of the method table of its class, its fields follow
+OBJECT_HEADER_SIZE = 1
+
+#where every field lives, computed once for all classes: instance fields at an offset in the object, static fields at
+#an offset in the static data. A class starts with the fields of its superclass, at the same offsets, so code compiled
+#for a superclass works on objects of its subclasses
+class Object_Layout:
+
+    def __init__(self, ast):
+        self.ast = ast
+        #field id -> offset in the object or in the static data
+        self.field_offsets : Dict[int, int] = {}
+        #class name -> number of words of an object, header included
+        self.object_sizes : Dict[str, int] = {}
+        #class name -> field name -> the field found by that name in the class, the nearest declaration up its chain of
+        #superclasses
+        self.visible_fields : Dict[str, Dict[str, Field_Record]] = {}
+        self.static_data_size = 0
+
+        #superclasses are laid out first
+        for class_record in ast.get_class_records_by_depth():
+            self.add_class(class_record)
+
+    def add_class(self, class_record):
+
+        size = self.object_sizes.get(class_record.get_super_class_name(), OBJECT_HEADER_SIZE)
+        visible_fields = dict(self.visible_fields.get(class_record.get_super_class_name(), {}))
+        visible_fields.update(class_record.fields_by_name)
+
+        for field in class_record.fields:
+            if field.applicability == 'static':
+                self.field_offsets[field.id] = self.static_data_size
+                self.static_data_size += 1
+            else:
+                self.field_offsets[field.id] = size
+                size += 1
+
+        self.object_sizes[class_record.class_name] = size
+        self.visible_fields[class_record.class_name] = visible_fields
+
+    def get_field(self, class_name : str, field_name : str) -> Optional[Field_Record]:
+        return self.visible_fields.get(class_name, {}).get(field_name)
+
+    def get_field_offset(self, field_id : int) -> int:
+        return self.field_offsets[field_id]
+
+    def get_object_size(self, class_name : str) -> int:
+        return self.object_sizes[class_name]
+
+
 class AST:
 
     def to_dict(self):
@@ -1610,73 +1642,143 @@ class AST:
         if subclass_name == class_name:
             return True
         
-        cur_class_record = self.class_records[subclass_name]
+        return class_name in self.get_ancestor_set(subclass_name)
+    
+    #ancestors of every class, computed once: the class and its superclasses nearest first. The chain stops at a
+    #superclass that is not defined, or where it leads back to a class it passed through - an inheritance cycle
+    def compute_ancestry(self):
+        
+        self.ancestor_names = {}
+        self.ancestor_sets = {}
+        self.class_depths = {}
+        self.cyclic_class_names = set()
         
-        while cur_class_record.get_super_class_name() != None:
+        for class_name in self.class_records:
+            
+            chain : List[str] = []
+            chain_names = set()
+            cur_name = class_name
             
-            if cur_class_record.get_super_class_name() == class_name:
-                return True
+            while cur_name in self.class_records and cur_name not in self.ancestor_names and cur_name not in chain_names:
+                chain.append(cur_name)
+                chain_names.add(cur_name)
+                cur_name = self.class_records[cur_name].get_super_class_name()
             
-            cur_class_record = self.class_records[cur_class_record.get_super_class_name()]
+            if cur_name in chain_names:
+                #every class of the cycle has the others as ancestors, in the order they extend each other
+                cycle = chain[chain.index(cur_name):]
+                self.cyclic_class_names.update(cycle)
+                for index, name in enumerate(cycle):
+                    self.ancestor_names[name] = cycle[index:] + cycle[:index]
+                chain = chain[:chain.index(cur_name)]
             
+            tail = self.ancestor_names.get(cur_name, [])
+            
+            for index in range(len(chain) - 1, -1, -1):
+                self.ancestor_names[chain[index]] = chain[index:] + tail
         
-        return False 
+        for class_name, names in self.ancestor_names.items():
+            self.ancestor_sets[class_name] = frozenset(names)
+            self.class_depths[class_name] = len(names) - 1
     
+    def get_ancestor_names(self, class_name : str) -> List[str]:
+        
+        if self.ancestor_names == None:
+            self.compute_ancestry()
+        
+        return self.ancestor_names.get(class_name, [class_name])
     
-    def compute_id_from_field(self, field_class_name, field_name) -> Optional[int]:
+    def get_ancestor_set(self, class_name : str) -> FrozenSet[str]:
         
-        class_record = self.get_class_record(field_class_name)
+        if self.ancestor_sets == None:
+            self.compute_ancestry()
         
-        if class_record == None:
-            return None
+        return self.ancestor_sets.get(class_name, frozenset([class_name]))
+    
+    #number of superclasses of the class
+    def get_class_depth(self, class_name : str) -> int:
+        
+        if self.class_depths == None:
+            self.compute_ancestry()
         
-        field = class_record.get_field_from_name(field_name)
+        return self.class_depths.get(class_name, 0)
+    
+    #a class comes after all of its superclasses, and classes of the same depth in the order they were declared
+    def get_class_records_by_depth(self) -> List[Class_Record]:
+        return sorted(self.class_records.values(), key=lambda class_record: self.get_class_depth(class_record.class_name))
+    
+    def get_cyclic_class_names(self) -> Set[str]:
+        
+        if self.cyclic_class_names == None:
+            self.compute_ancestry()
+        
+        return self.cyclic_class_names
+    
+    def compute_id_from_field(self, field_class_name, field_name) -> Optional[int]:
+        
+        field = self.get_object_layout().get_field(field_class_name, field_name)
         
         if field == None:
-            
-            super_class_record = self.get_class_record(class_record.super_class_name)
-            
-            if super_class_record == None:
-                return None
-            
-            field = super_class_record.get_field_from_name(field_name)
-            
-            if field == None:
-                return None
-            
-            return field.id
+            return None
         
         return field.id
            
         
     def compute_type_from_field(self, class_name : str, field_name : str):
-        class_record = self.get_class_record(class_name)
         
-        if class_record == None:
+        if self.get_class_record(class_name) == None:
             print("ERROR: field not found in class")
             return decaf_typecheck.BaseType.ERROR
         
-        field = class_record.get_field_from_name(field_name)
+        field = self.get_object_layout().get_field(class_name, field_name)
         
         if field == None:
+            return decaf_typecheck.BaseType.ERROR
+        
+        return field.get_type()
+    
+    #built on first use, once every class has been added
+    def get_object_layout(self) -> Object_Layout:
+        
+        if self.object_layout == None:
+            self.resolve_inheritance()
+            self.object_layout = Object_Layout(self)
+        
+        return self.object_layout
+    
+    #the class and its superclasses, nearest first - stops at a superclass that is not defined or that leads back to the class
+    def get_ancestor_records(self, class_record : Class_Record) -> List[Class_Record]:
+        return [self.class_records[name] for name in self.get_ancestor_names(class_record.class_name)]
+    
+    #indexes the fields and methods every class inherits, superclasses first, so that members are found by name
+    #through the whole chain of superclasses with a single lookup, and the methods of all classes by id
+    def resolve_inheritance(self):
+        
+        if self.inheritance_resolved:
+            return
+        
+        resolved = set()
+        self.method_records = {}
+        
+        for class_record in self.get_class_records_by_depth():
             
-            super_class_record = self.get_class_record(class_record.super_class_name)
-            
-            if super_class_record == None:
-                return decaf_typecheck.BaseType.ERROR
-            
-            field = super_class_record.get_field_from_name(field_name)
-            
-            if field == None:
-                return decaf_typecheck.BaseType.ERROR
-            
-            
-            return field.get_type()
+            for method_record in class_record.get_method_records():
+                self.method_records[method_record.id] = method_record
             
+            super_class_name = class_record.get_super_class_name()
             
+            if super_class_name in resolved:
+                class_record.visible_fields = dict(self.class_records[super_class_name].visible_fields)
+                class_record.visible_methods = dict(self.class_records[super_class_name].visible_methods)
+            else:
+                class_record.visible_fields = {}
+                class_record.visible_methods = {}
             
+            class_record.visible_fields.update(class_record.fields_by_name)
+            class_record.visible_methods.update(class_record.methods_by_name)
+            resolved.add(class_record.class_name)
         
-        return field.get_type()
+        self.inheritance_resolved = True
     
     #do not check for private vs not private yet - return 
     def can_access_field(self, using_class_name : str, field_name : str, field_class_name : str) -> Optional[int]:
@@ -1686,16 +1788,22 @@ class AST:
             print("ERROR: field not found in class")
             return None
         
-        field_id = class_record.get_field_id_from_name(field_name)
+        field = class_record.get_visible_field(field_name)
         
-        if field_id == None:
+        if field == None:
             print("ERROR: not found TODO")
             return None
         
-        return field_id
+        return field.id
         
 
     def type_check(self):
+        
+        if len(self.get_cyclic_class_names()) > 0:
+            print_error_msg(f'cyclic inheritance involving {", ".join(sorted(self.get_cyclic_class_names()))}')
+            return False
+        
+        self.resolve_inheritance()
         #type check each class
         for c, record in self.class_records.items():
             if record.type_check(self) == False:
@@ -1710,9 +1818,20 @@ class AST:
 
     def get_class_records(self) -> List[Class_Record]:
         return list(self.class_records.values())
+    
+    def get_method_record(self, method_id : int) -> Optional[Method_Record]:
+        self.resolve_inheritance()
+        return self.method_records.get(method_id)
 
     def __init__(self):
         self.class_records : Dict[str, Class_Record] = {}
+        self.ancestor_names : Optional[Dict[str, List[str]]] = None
+        self.ancestor_sets : Optional[Dict[str, FrozenSet[str]]] = None
+        self.class_depths : Optional[Dict[str, int]] = None
+        self.cyclic_class_names : Optional[Set[str]] = None
+        self.object_layout : Optional[Object_Layout] = None
+        self.inheritance_resolved = False
+        self.method_records : Dict[int, Method_Record] = {}
         self.create_standard_objects()
         
 
@@ -1723,6 +1842,12 @@ class AST:
             #sys.exit()
 
         self.class_records[class_record.class_name] = class_record
+        self.ancestor_names = None
+        self.ancestor_sets = None
+        self.class_depths = None
+        self.cyclic_class_names = None
+        self.object_layout = None
+        self.inheritance_resolved = False
                 
 
     
@@ -0,0 +1,213 @@
+import decaf_ast
+from typing import Dict, List, Optional, Set, Tuple
+
+
+#statements and expressions directly contained in an AST node
+def get_children(node) -> List:
+
+    if isinstance(node, list):
+        return node
+
+    if isinstance(node, decaf_ast.Block_Stmt):
+        return node.get_statements_list()
+
+    if isinstance(node, decaf_ast.If_Statement):
+        return [node.if_expression, node.then_statement, node.else_statement]
+
+    if isinstance(node, decaf_ast.While_Statement):
+        return [node.loop_condition, node.loop_body]
+
+    if isinstance(node, decaf_ast.For_Statement):
+        return [node.initializer_expression, node.loop_condition, node.update_expression, node.loop_body]
+
+    if isinstance(node, decaf_ast.Expression_Statement):
+        return [node.get_expression()]
+
+    if isinstance(node, decaf_ast.Return_Statement):
+        return [node.expression]
+
+    if isinstance(node, decaf_ast.WriteStatement):
+        return [node.data]
+
+    if isinstance(node, decaf_ast.Assign_Expression):
+        return [node.left_hand_side, node.right_hand_side]
+
+    if isinstance(node, decaf_ast.Field_Access_Expression):
+        return [node.base_expression]
+
+    if isinstance(node, decaf_ast.Binary_Expression):
+        return [node.left_expr, node.right_expr]
+
+    if isinstance(node, decaf_ast.Unary_Expression):
+        return [node.expression]
+
+    if isinstance(node, decaf_ast.Auto_Expression):
+        return [node.operand_expression]
+
+    if isinstance(node, decaf_ast.Method_Call_Expression):
+        return [node.base_expression] + list(node.arguments)
+
+    if isinstance(node, decaf_ast.New_Object_Expression):
+        return list(node.arguments)
+
+    #constants, variables, this, class references, skip, break and continue
+    return []
+
+#every node of a method body, parents before their children
+def walk(node):
+    stack = [node]
+    while len(stack) > 0:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(get_children(node)))
+
+
+#class hierarchy analysis - the methods a call can run, given every class that extends the class of its receiver
+class ClassHierarchy:
+
+    def __init__(self, ast : decaf_ast.AST):
+        ast.resolve_inheritance()
+        self.ast = ast
+        self.direct_subclass_names : Dict[str, List[str]] = {}
+        self.implementations : Dict[Tuple[str, int], List[int]] = {}
+        self.method_tables : Dict[str, List[decaf_ast.Method_Record]] = {}
+
+        for class_record in ast.get_class_records():
+            self.direct_subclass_names.setdefault(class_record.class_name, [])
+            if class_record.get_super_class_name() != None:
+                self.direct_subclass_names.setdefault(class_record.get_super_class_name(), []).append(class_record.class_name)
+
+    #the class and every class that extends it, directly or through other classes
+    def get_subclass_names(self, class_name : str) -> List[str]:
+
+        res = []
+        stack = [class_name]
+
+        while len(stack) > 0:
+            name = stack.pop()
+            if name in res:
+                continue
+            res.append(name)
+            stack.extend(self.direct_subclass_names.get(name, []))
+
+        return res
+
+    #the method run by a call on an object of the class - the nearest definition up its chain of superclasses
+    def resolve_method(self, class_name : str, method_name : str) -> Optional[decaf_ast.Method_Record]:
+
+        class_record = self.ast.get_class_record(class_name)
+        if class_record == None:
+            return None
+
+        return class_record.get_visible_method(method_name)
+
+    #ids of the methods a call resolved to the method can run - receiver_class_name is the class of the receiver known
+    #at compile time, the class of the method when it is not given. A static method is its only implementation
+    def get_implementations(self, method_id : int, receiver_class_name : Optional[str] = None) -> List[int]:
+
+        method_record = self.ast.get_method_record(method_id)
+
+        if method_record == None:
+            return []
+
+        if method_record.applicability == 'static':
+            return [method_id]
+
+        if receiver_class_name == None:
+            receiver_class_name = method_record.containing_class
+
+        key = (receiver_class_name, method_id)
+
+        if key not in self.implementations:
+            implementations = []
+            for class_name in self.get_subclass_names(receiver_class_name):
+                implementation = self.resolve_method(class_name, method_record.name)
+                if implementation != None and implementation.applicability != 'static' and implementation.id not in implementations:
+                    implementations.append(implementation.id)
+            self.implementations[key] = implementations
+
+        return self.implementations[key]
+
+    #instance methods of a class by slot of its method table - the slots of its superclass come first, in the same order,
+    #and a method overriding one of them takes its slot, so a method has the same slot in the tables of all subclasses
+    def get_method_table(self, class_name : str) -> List[decaf_ast.Method_Record]:
+
+        if class_name not in self.method_tables:
+
+            table : List[decaf_ast.Method_Record] = []
+            slots : Dict[str, int] = {}
+            class_record = self.ast.get_class_record(class_name)
+
+            if class_record != None:
+                for record in reversed(self.ast.get_ancestor_records(class_record)):
+                    for method_record in record.get_method_records():
+                        if method_record.applicability == 'static':
+                            continue
+                        if method_record.name in slots:
+                            table[slots[method_record.name]] = method_record
+                        else:
+                            slots[method_record.name] = len(table)
+                            table.append(method_record)
+
+            self.method_tables[class_name] = table
+
+        return self.method_tables[class_name]
+
+    def get_method_slot(self, method_id : int) -> int:
+
+        method_record = self.ast.get_method_record(method_id)
+
+        for slot, slot_record in enumerate(self.get_method_table(method_record.containing_class)):
+            if slot_record.id == method_id:
+                return slot
+
+        raise ValueError(f'"{method_record.name}" has no slot in the method table of {method_record.containing_class}')
+
+    #a call that can only run the method it was resolved to is made directly, without a dispatch
+    def has_single_implementation(self, method_id : int, receiver_class_name : Optional[str] = None) -> bool:
+        return self.get_implementations(method_id, receiver_class_name) == [method_id]
+
+
+#methods and constructors that can run when the program starts at its static main methods
+#a call may reach every implementation of the method it was resolved to, a new object expression reaches the constructor
+#returns (method ids, constructor ids), or None if the program has no static main
+def find_reachable_code(ast : decaf_ast.AST) -> Optional[Tuple[Set[int], Set[int]]]:
+
+    bodies : Dict[Tuple[str, int], decaf_ast.Block_Stmt] = {}
+    worklist : List[Tuple[str, int]] = []
+
+    for class_record in ast.get_class_records():
+        for constructor in class_record.constructors:
+            bodies[('constructor', constructor.id)] = constructor.get_constructor_body()
+        for method_record in class_record.get_method_records():
+            bodies[('method', method_record.id)] = method_record.get_method_body()
+            if method_record.name == 'main' and method_record.applicability == 'static':
+                worklist.append(('method', method_record.id))
+
+    if len(worklist) == 0:
+        return None
+
+    hierarchy = ClassHierarchy(ast)
+    reached : Set[Tuple[str, int]] = set(worklist)
+
+    while len(worklist) > 0:
+
+        for node in walk(bodies[worklist.pop()]):
+
+            targets = []
+
+            if isinstance(node, decaf_ast.Method_Call_Expression):
+                targets = [('method', method_id) for method_id in hierarchy.get_implementations(node.method_id, node.receiver_class_name)]
+
+            elif isinstance(node, decaf_ast.New_Object_Expression):
+                class_record = ast.get_class_record(node.class_name)
+                constructor_id = None if class_record == None else class_record.get_id_from_method_name(node.class_name)
+                if constructor_id != None:
+                    targets = [('constructor', constructor_id)]
+
+            for target in targets:
+                if target not in reached and target in bodies:
+                    reached.add(target)
+                    worklist.append(target)
+
+    return ({id for kind, id in reached if kind == 'method'}, {id for kind, id in reached if kind == 'constructor'})
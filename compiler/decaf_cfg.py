@@ -0,0 +1,230 @@
+import decaf_absmc
+from typing import Dict, List, Optional, Set
+
+
+Instruction = decaf_absmc.Instruction
+
+#instructions that end a basic block - a call returns to the next instruction, so it does not
+BLOCK_TERMINATORS = decaf_absmc.CONDITIONAL_BRANCHES | {Instruction.JMP, Instruction.RET}
+
+
+class BasicBlock:
+
+    def __init__(self, index : int):
+        self.index = index
+        #label entries (['name:', [], comment]) at the start of the block
+        self.labels : List[List] = []
+        self.instructions : List[List] = []
+        self.successors : List[int] = []
+        self.predecessors : List[int] = []
+        #immediate dominator, None for the entry block and for unreachable blocks
+        self.immediate_dominator : Optional[int] = None
+        self.dominator_children : List[int] = []
+        #innermost loop containing the block, None outside of loops
+        self.loop : Optional['Loop'] = None
+
+    def get_label_names(self) -> List[str]:
+        return [label[0][:-1] for label in self.labels]
+
+    def get_terminator(self) -> Optional[List]:
+        if len(self.instructions) > 0 and self.instructions[-1][0] in BLOCK_TERMINATORS:
+            return self.instructions[-1]
+        return None
+
+    #whether control can reach the block that follows it in the section
+    def falls_through(self) -> bool:
+        terminator = self.get_terminator()
+        return terminator == None or terminator[0] in decaf_absmc.CONDITIONAL_BRANCHES
+
+    def __str__(self):
+        return f'B{self.index}({", ".join(self.get_label_names())}) -> {self.successors}'
+
+
+#natural loop: the header dominates every block of the body and the latches jump back to it
+class Loop:
+
+    def __init__(self, header : int):
+        self.header = header
+        self.latches : List[int] = []
+        self.body : Set[int] = {header}
+        self.parent : Optional['Loop'] = None
+        self.children : List['Loop'] = []
+        self.depth = 1
+
+    def get_exits(self, cfg : 'ControlFlowGraph') -> List[int]:
+        return sorted({successor for block in self.body for successor in cfg.blocks[block].successors if successor not in self.body})
+
+    def __str__(self):
+        return f'Loop(B{self.header}, {sorted(self.body)}, depth {self.depth})'
+
+
+#control flow graph of one labeled section of an AbstractProgram
+#the blocks are kept in section order, so to_section gives back the original instruction list
+class ControlFlowGraph:
+
+    def __init__(self, section : List):
+        self.blocks : List[BasicBlock] = []
+        self.label_to_block : Dict[str, int] = {}
+        self.loops : List[Loop] = []
+
+        self.split_basic_blocks(section)
+        self.compute_edges()
+        self.compute_dominators()
+        self.find_loops()
+
+    def split_basic_blocks(self, section : List):
+
+        block = BasicBlock(0)
+        self.blocks.append(block)
+
+        for instruction_tuple in section:
+
+            if decaf_absmc.is_label_entry(instruction_tuple):
+                if len(block.instructions) > 0:
+                    block = BasicBlock(len(self.blocks))
+                    self.blocks.append(block)
+                block.labels.append(instruction_tuple)
+                self.label_to_block[instruction_tuple[0][:-1]] = block.index
+                continue
+
+            block.instructions.append(instruction_tuple)
+
+            if instruction_tuple[0] in BLOCK_TERMINATORS:
+                block = BasicBlock(len(self.blocks))
+                self.blocks.append(block)
+
+        if len(self.blocks) > 1 and len(block.labels) == 0 and len(block.instructions) == 0:
+            self.blocks.pop()
+
+    #jumps to labels outside of the section have no edge
+    def compute_edges(self):
+
+        for block in self.blocks:
+            block.successors = []
+            block.predecessors = []
+
+        for block in self.blocks:
+
+            terminator = block.get_terminator()
+
+            if block.falls_through() and block.index + 1 < len(self.blocks):
+                block.successors.append(block.index + 1)
+
+            if terminator != None and terminator[0] != Instruction.RET:
+                target = self.label_to_block.get(terminator[1][-1])
+                if target != None and target not in block.successors:
+                    block.successors.append(target)
+
+            for successor in block.successors:
+                self.blocks[successor].predecessors.append(block.index)
+
+    #blocks reachable from the entry in reverse postorder
+    def get_reverse_postorder(self) -> List[int]:
+
+        order : List[int] = []
+        visited : Set[int] = {0}
+        stack = [(0, iter(self.blocks[0].successors))]
+
+        while len(stack) > 0:
+            index, successors = stack[-1]
+            successor = next(successors, None)
+            if successor == None:
+                order.append(index)
+                stack.pop()
+            elif successor not in visited:
+                visited.add(successor)
+                stack.append((successor, iter(self.blocks[successor].successors)))
+
+        order.reverse()
+        return order
+
+    #iterative algorithm of Cooper, Harvey and Kennedy
+    def compute_dominators(self):
+
+        order = self.get_reverse_postorder()
+        position = {index : number for number, index in enumerate(order)}
+
+        for block in self.blocks:
+            block.immediate_dominator = None
+            block.dominator_children = []
+
+        dominators : Dict[int, int] = {0 : 0}
+
+        def intersect(a : int, b : int) -> int:
+            while a != b:
+                while position[a] > position[b]:
+                    a = dominators[a]
+                while position[b] > position[a]:
+                    b = dominators[b]
+            return a
+
+        changed = True
+        while changed:
+            changed = False
+            for index in order[1:]:
+                new_dominator = None
+                for predecessor in self.blocks[index].predecessors:
+                    if predecessor in dominators:
+                        new_dominator = predecessor if new_dominator == None else intersect(predecessor, new_dominator)
+                if dominators.get(index) != new_dominator:
+                    dominators[index] = new_dominator
+                    changed = True
+
+        for index, dominator in dominators.items():
+            if index != 0:
+                self.blocks[index].immediate_dominator = dominator
+                self.blocks[dominator].dominator_children.append(index)
+
+    def dominates(self, a : int, b : int) -> bool:
+        while b != None:
+            if a == b:
+                return True
+            b = self.blocks[b].immediate_dominator
+        return False
+
+    def is_reachable(self, index : int) -> bool:
+        return index == 0 or self.blocks[index].immediate_dominator != None
+
+    #every back edge (an edge to a block that dominates its source) gives a natural loop, loops sharing a header are merged
+    def find_loops(self):
+
+        loops : Dict[int, Loop] = {}
+
+        for block in self.blocks:
+            if not self.is_reachable(block.index):
+                continue
+            for successor in block.successors:
+                if self.dominates(successor, block.index):
+
+                    loop = loops.setdefault(successor, Loop(successor))
+                    loop.latches.append(block.index)
+
+                    worklist = [block.index]
+                    while len(worklist) > 0:
+                        index = worklist.pop()
+                        if index not in loop.body:
+                            loop.body.add(index)
+                            worklist.extend(self.blocks[index].predecessors)
+
+        #outer loops first, so that every loop finds its innermost parent among the loops before it
+        self.loops = sorted(loops.values(), key=lambda loop: -len(loop.body))
+
+        for number, loop in enumerate(self.loops):
+            for outer in reversed(self.loops[:number]):
+                if loop.header in outer.body:
+                    loop.parent = outer
+                    loop.depth = outer.depth + 1
+                    outer.children.append(loop)
+                    break
+            for index in loop.body:
+                self.blocks[index].loop = loop
+
+    def to_section(self) -> List:
+        section = []
+        for block in self.blocks:
+            section.extend(block.labels)
+            section.extend(block.instructions)
+        return section
+
+    def __str__(self):
+        return '\n'.join(str(block) for block in self.blocks)
@@ -1,7 +1,11 @@
 import decaf_ast
 import decaf_absmc
 import decaf_typecheck
-from typing import Dict, List, Tuple
+import decaf_regalloc
+import decaf_optimize
+import decaf_inline
+import decaf_callgraph
+from typing import Dict, List, Set, Tuple, Optional
 
 
 def convert_boolean_to_int(boolean : str) -> int:
@@ -9,20 +13,52 @@ def convert_boolean_to_int(boolean : str) -> int:
         return 1
     return 0
 
+#branch taken when the comparison holds
+COMPARE_BRANCHES = {decaf_ast.Operation.LESSTHAN : decaf_absmc.Instruction.BLT, decaf_ast.Operation.LESSOREQUAL : decaf_absmc.Instruction.BLEQ,
+                    decaf_ast.Operation.GREATERTHAN : decaf_absmc.Instruction.BGT, decaf_ast.Operation.GREATEROREQUAL : decaf_absmc.Instruction.BGEQ,
+                    decaf_ast.Operation.EQUALS : decaf_absmc.Instruction.BEQ, decaf_ast.Operation.NOTEQUALS : decaf_absmc.Instruction.BNEQ}
+
 class AbstractCodeGenerator:
 
-    def __init__(self, ast : decaf_ast.AST):
+    #register_budget - number of temporaries the register allocator aims for, None disables allocation
+    #save_live_regs_only - only keep the saves of registers that are live across a call
+    #optimize - fold constants, reuse values, hoist loop invariants, rotate loops and remove dead code before registers are allocated, run the peephole rules after
+    #inline_budget - size of the largest method body that is inlined at its call sites, None disables inlining. A method
+    #takes in at most decaf_inline.INLINE_GROWTH_FACTOR times this much inlined code in total
+    #tail_calls - a returned direct call jumps to the method instead of calling it
+    #remove_unreachable - only generate the methods and constructors that can run when the program starts at main
+    def __init__(self, ast : decaf_ast.AST, register_budget : Optional[int] = decaf_regalloc.DEFAULT_REGISTER_BUDGET, save_live_regs_only : bool = True, optimize : bool = True, inline_budget : Optional[int] = decaf_inline.DEFAULT_INLINE_BUDGET, tail_calls : bool = True, remove_unreachable : bool = True):
+        self.register_budget = register_budget
+        self.remove_unreachable = remove_unreachable
+        self.tail_calls = tail_calls
+        self.hierarchy = decaf_callgraph.ClassHierarchy(ast)
+        self.inliner = None if inline_budget == None else decaf_inline.Inliner(inline_budget)
+        #id of the method being generated, None for constructors
+        self.cur_method_id : Optional[int] = None
+        #(method id, result register, end label, this register) of every method being inlined, innermost last
+        self.inline_stack : List[Tuple[int, str, str, Optional[str]]] = []
+        self.save_live_regs_only = save_live_regs_only
+        self.optimize = optimize
+        self.optimization_stats = decaf_optimize.OptimizationStats()
+        #number of argument registers read by the callee, by label
+        self.call_arguments : Dict[str, int] = {}
         self.cur_arg_register = 1 
         self.cur_tmp_register = 0
         self.ast = ast
-        self.register_save_stack : List[str] = []
+        #one list of saved registers per call that is being generated
+        self.register_save_stack : List[List[str]] = []
         self.program = decaf_absmc.AbstractProgram()
-        self.instance_field_id_to_offset_map : Dict[int, int] = {}
-        self.static_fields_to_offset_map: Dict[Tuple[str, str], int] = {}
-        self.cur_num_static_fields = 0
+        self.layout = ast.get_object_layout()
+        self.cur_static_data_size = self.layout.static_data_size
+        #offset of the method table of every class in the static data, after the static fields
+        self.method_table_offsets : Dict[str, int] = {}
+        #(receiver class, slot) of every dispatched call - only these slots of the tables are filled in
+        self.dispatched_slots : Set[Tuple[str, int]] = set()
         self.cur_if_statement = 1
         self.cur_while_statement = 1
         self.cur_for_statement = 1
+        self.cur_short_circuit = 1
+        self.cur_inline = 1
         
     def get_next_for_control_flow_labels(self) -> Tuple[str, str, str, str]:
         res = (f'for_{self.cur_for_statement}_cond', f'for_{self.cur_for_statement}_body', f'for_{self.cur_for_statement}_update', f'for_{self.cur_for_statement}_end')
@@ -39,36 +75,48 @@ class AbstractCodeGenerator:
         res = (f'if_{self.cur_if_statement}_then', f'if_{self.cur_if_statement}_else', f'if_{self.cur_if_statement}_end') 
         self.cur_if_statement += 1
         return res
+    
+    #operation_name is 'and' or 'or'
+    def get_next_short_circuit_label(self, operation_name : str) -> str:
+        res = f'{operation_name}_{self.cur_short_circuit}_end'
+        self.cur_short_circuit += 1
+        return res
         
 
     
-    def add_static_field(self, field: Tuple[str, str]):
-        self.static_fields_to_offset_map[field] = self.cur_num_static_fields
-        self.cur_num_static_fields += 1
-            
+    def get_next_inline_label(self) -> str:
+        res = f'inline_{self.cur_inline}_end'
+        self.cur_inline += 1
+        return res
     
-    def get_instance_field_id_to_offset_map(self) -> Dict[int, int]:
-        return self.instance_field_id_to_offset_map
+    #the register holding this - a0, unless an inlined instance method is being generated
+    def get_this_register(self) -> str:
+        if len(self.inline_stack) > 0:
+            return self.inline_stack[-1][3]
+        return "a0"
     
-    def set_instance_field_id_to_offset_map(self, map : Dict[int, int]):
-        self.instance_field_id_to_offset_map = map
-        
+    #saves are pruned to the registers that are live across the call once the method is complete
     def save_all_regs_cur_used(self, cur_label):
         
+        saved_regs = []
+        self.register_save_stack.append(saved_regs)
+        
         for i in range(0, self.cur_arg_register):
-            self.register_save_stack.append(f'a{i}')
+            saved_regs.append(f'a{i}')
             self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.SAVE, [f'a{i}'], ""])
             
         for i in range(0, self.cur_tmp_register):
-            self.register_save_stack.append(f't{i}')
+            saved_regs.append(f't{i}')
             self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.SAVE, [f't{i}'], ""])
             
         
-    
+    #only restores the registers saved for the innermost call
     def restore_all_saved_regs(self, cur_label):
         
-        while len(self.register_save_stack) > 0:
-            self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.RESTORE, [self.register_save_stack.pop()], ""])
+        saved_regs = self.register_save_stack.pop()
+        
+        while len(saved_regs) > 0:
+            self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.RESTORE, [saved_regs.pop()], ""])
         
 
     def reset_tmp_register(self):
@@ -94,34 +142,51 @@ class AbstractCodeGenerator:
         class_records = self.ast.get_class_records()
         
         
-        #determine static fields
+        #the static fields come first in the static data, the method tables follow
         for class_record in class_records:
-            class_instance_field_offset = 0
-            for field in class_record.fields:
-                if field.applicability == 'static':
-                    self.add_static_field((class_record.class_name, field.name))
-                else:
-                    self.instance_field_id_to_offset_map[field.id] = class_instance_field_offset
-                    class_instance_field_offset += 1
-                    
-        self.program.set_size_static_section(self.cur_num_static_fields)
+            self.method_table_offsets[class_record.class_name] = self.cur_static_data_size
+            self.cur_static_data_size += len(self.hierarchy.get_method_table(class_record.class_name))
+        
+        self.program.set_size_static_section(self.cur_static_data_size)
+        
+        for class_record in class_records:
+            for constructor in class_record.constructors:
+                self.call_arguments[f'C_{constructor.id}'] = constructor.get_num_params() + 1
+            for method_record in class_record.get_method_records():
+                self.call_arguments[f'M_{method_record.name}_{method_record.id}'] = method_record.get_param_count() + (0 if method_record.applicability == 'static' else 1)
         
+        #a program without a static main is generated completely
+        reachable = decaf_callgraph.find_reachable_code(self.ast) if self.remove_unreachable else None
+        entry_labels = ["_start"]
         
         for class_record in class_records:
              
             self.program.create_label_group(class_record.class_name, f"#====== Code for class {class_record.class_name}")
             
             for constructor in class_record.constructors:
+                
+                if reachable != None and constructor.id not in reachable[1]:
+                    self.optimization_stats.unreachable_methods += 1
+                    continue
+                
                 self.reset_tmp_register()
                 self.reset_arg_register(1)
                 
                 constructor_label = f'C_{constructor.id}'
                 self.program.create_labeled_section(constructor_label, class_record.class_name)
                 
+                self.cur_method_id = None
+                self.start_inlining()
                 self.generate_constructor_code(constructor, constructor_label)
+                self.optimize_section(constructor_label)
             
             methods = class_record.get_method_records()
             for method_record in methods:
+                
+                if reachable != None and method_record.id not in reachable[0]:
+                    self.optimization_stats.unreachable_methods += 1
+                    continue
+                
                 self.reset_tmp_register()
                 self.reset_arg_register(0 if method_record.applicability == 'static' else 1)
                 
@@ -131,30 +196,86 @@ class AbstractCodeGenerator:
                 if method_record.name == 'main'and method_record.applicability == 'static':
                     #self.program.append_label_to_labeled_section(meh)
                     self.program.create_labeled_section("_start", class_record.class_name)
+                    entry_labels.append(method_label)
                 
                 self.program.create_labeled_section(method_label, class_record.class_name)
+                self.cur_method_id = method_record.id
+                self.start_inlining()
                 self.generate_method_code(method_record, method_label)        
+                self.optimize_section(method_label)
+        
+        #the slots to fill are only known once every dispatched call has been generated, so _start is optimized last
+        if "_start" in self.program.labels_to_sections_map:
+            self.generate_method_table_code("_start")
+            self.optimize_section("_start")
+        
+        #methods whose every call was inlined are not needed either
+        if reachable != None:
+            self.optimization_stats.unreachable_methods += len(self.program.remove_unreferenced_sections(entry_labels))
 
         return self.program
     
+    #fills in the slots of the method tables that dispatched calls read, before main runs. A slot is left empty when
+    #no call dispatches through it or its method is never generated - the machine rejects a callr through an empty slot
+    def generate_method_table_code(self, cur_label):
+        
+        self.reset_tmp_register()
+        address_reg = self.get_next_tmp_register()
+        
+        for class_record in self.ast.get_class_records():
+            
+            method_table = self.hierarchy.get_method_table(class_record.class_name)
+            
+            for slot, method_record in enumerate(method_table):
+                
+                method_label = f'M_{method_record.name}_{method_record.id}'
+                
+                if method_label not in self.program.labels_to_sections_map:
+                    continue
+                
+                if not any(class_record.class_name in self.hierarchy.get_subclass_names(receiver_class_name) for receiver_class_name, dispatched_slot in self.dispatched_slots if dispatched_slot == slot):
+                    continue
+                
+                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.MOVE_IMMED_L, [address_reg, method_label], f"{class_record.class_name}.{method_record.name}"])
+                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.HSTOREI, ["sap", str(self.method_table_offsets[class_record.class_name] + slot), address_reg], "store to method table"])
+    
+    #runs on the virtual registers of a finished section, so the allocator comes last
+    def optimize_section(self, label):
+        
+        section = self.program.labels_to_sections_map[label]
+        
+        if self.optimize:
+            decaf_optimize.fold_constants(section, self.optimization_stats)
+            decaf_optimize.number_values(section, self.optimization_stats)
+            
+        if self.save_live_regs_only:
+            decaf_regalloc.remove_dead_saves(section, self.call_arguments)
+            
+        if self.optimize:
+            decaf_optimize.hoist_loop_invariants(section, self.optimization_stats)
+            decaf_optimize.rotate_loops(section, self.optimization_stats)
+            decaf_optimize.remove_dead_code(section, self.optimization_stats)
+        
+        if self.register_budget != None:
+            decaf_regalloc.allocate_registers(section, self.register_budget)
+            
+        if self.optimize:
+            decaf_optimize.peephole(section, self.optimization_stats)
+    
     #returns register in which result is
     def generate_expression_code(self, expression_record, cur_label, var_id_to_register_map):
         
         if isinstance(expression_record, decaf_ast.Auto_Expression):
             
             if expression_record.inc_dec == 'inc':
-                delta_ins = decaf_absmc.Instruction.IADD
+                delta = 1
             else:
-                delta_ins = decaf_absmc.Instruction.ISUB
+                delta = -1
                 
             
             if expression_record.post_pre == 'pre':
                 
-                delta_reg = self.get_next_tmp_register()
-                
-                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.MOVE_IMMED_I, [delta_reg, str(1)], "auto"])
-                
-                self.program.append_instruction_to_labeled_section(cur_label, [delta_ins, [var_id_to_register_map[expression_record.operand_expression.get_var()], var_id_to_register_map[expression_record.operand_expression.get_var()], delta_reg], "prefix operator"])
+                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.IADDI, [var_id_to_register_map[expression_record.operand_expression.get_var()], var_id_to_register_map[expression_record.operand_expression.get_var()], str(delta)], "prefix operator"])
                 
                 return  var_id_to_register_map[expression_record.operand_expression.get_var()]
             
@@ -168,11 +289,7 @@ class AbstractCodeGenerator:
                 
                 self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.MOVE, [old_reg, expr_reg], "copy for postfix operator"])
                 
-                delta_reg = self.get_next_tmp_register()
-                
-                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.MOVE_IMMED_I, [delta_reg, str(1)], "auto"])
-                
-                self.program.append_instruction_to_labeled_section(cur_label, [delta_ins, [expr_reg, expr_reg, delta_reg], "postfix operator"])
+                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.IADDI, [expr_reg, expr_reg, str(delta)], "postfix operator"])
                 
                 return old_reg
                 
@@ -186,23 +303,15 @@ class AbstractCodeGenerator:
                         
                         #static field
                         
-                        offset = self.static_fields_to_offset_map[(expression_record.left_hand_side.base_expression.class_name, expression_record.left_hand_side.field_name)]
+                        offset = self.layout.get_field_offset(expression_record.left_hand_side.id_of_field)
                         
-                        temp_reg = self.get_next_tmp_register()
-                        
-                        self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.MOVE_IMMED_I, [temp_reg, str(offset)], "store offset to static field"])
-                        
-                        self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.HSTORE, ["sap", temp_reg, expr_reg], ""])
+                        self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.HSTOREI, ["sap", str(offset), expr_reg], "store to static field"])
                         
                         return expr_reg
                        
                     base_expr_reg = self.generate_expression_code(expression_record.left_hand_side.base_expression, cur_label, var_id_to_register_map)
                         
-                    off_reg = self.get_next_tmp_register()
-                           
-                    self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.MOVE_IMMED_I, [off_reg, str(self.instance_field_id_to_offset_map[expression_record.left_hand_side.id_of_field])], "store offset for field access"])
-                    
-                    self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.HSTORE, [base_expr_reg, off_reg, expr_reg], ""])
+                    self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.HSTOREI, [base_expr_reg, str(self.layout.get_field_offset(expression_record.left_hand_side.id_of_field)), expr_reg], "store to field"])
                     
                     return expr_reg
                     
@@ -221,24 +330,18 @@ class AbstractCodeGenerator:
                 
                 reg = self.get_next_tmp_register()
                 
-                offset_reg = self.get_next_tmp_register()
-                
-                offset = self.get_instance_field_id_to_offset_map()[expression_record.id_of_field]
+                offset = self.layout.get_field_offset(expression_record.id_of_field)
                 
-                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.MOVE_IMMED_I, [offset_reg, str(offset)], " "])                
-                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.HLOAD, [reg, "a0", offset_reg], ""])
+                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.HLOADI, [reg, self.get_this_register(), str(offset)], ""])
                 
                 return reg
             
             elif isinstance(expression_record.base_expression, decaf_ast.Class_Reference_Expression):
                 reg = self.get_next_tmp_register()
                 
-                offset = self.static_fields_to_offset_map[(expression_record.base_expression.class_name, expression_record.field_name)]
+                offset = self.layout.get_field_offset(expression_record.id_of_field)
                 
-                offset_reg = self.get_next_tmp_register()
-                
-                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.MOVE_IMMED_I, [offset_reg, str(offset)], " "])                
-                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.HLOAD, [reg, "sap", offset_reg], ""])
+                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.HLOADI, [reg, "sap", str(offset)], ""])
                 
                 return reg
                 
@@ -247,14 +350,11 @@ class AbstractCodeGenerator:
                 
                 reg = self.get_next_tmp_register()
                 
-                offset = self.instance_field_id_to_offset_map[expression_record.id_of_field]
-                
-                offset_reg = self.get_next_tmp_register()
+                offset = self.layout.get_field_offset(expression_record.id_of_field)
                 
                 var_reg = var_id_to_register_map[expression_record.base_expression.var]
                 
-                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.MOVE_IMMED_I, [offset_reg, str(offset)], " "])                
-                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.HLOAD, [reg, var_reg, offset_reg], ""])
+                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.HLOADI, [reg, var_reg, str(offset)], ""])
                 
                 #field access
                 
@@ -268,15 +368,20 @@ class AbstractCodeGenerator:
             class_record = self.ast.get_class_record(expression_record.class_name)
             constructor_id = class_record.get_id_from_method_name(expression_record.class_name)
              
-            count = class_record.get_instance_field_count()
+            count = self.layout.get_object_size(class_record.class_name)
             
             count_reg = self.get_next_tmp_register()
             heap_reg = self.get_next_tmp_register()
+            table_reg = self.get_next_tmp_register()
             
             self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.MOVE_IMMED_I, [count_reg , str(count)], "t1 := number of fields"])
             
             self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.HALLOC, [heap_reg, count_reg] , "allocate heap memory for fields"])
             
+            self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.IADDI, [table_reg, "sap", str(self.method_table_offsets[class_record.class_name])], "method table of the class"])
+            
+            self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.HSTOREI, [heap_reg, "0", table_reg], "store object header"])
+            
             self.save_all_regs_cur_used(cur_label)
             
             self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.MOVE, ["a0", heap_reg], "pointer to object must be in first arg register"])
@@ -325,17 +430,15 @@ class AbstractCodeGenerator:
         if isinstance(expression_record, decaf_ast.Unary_Expression):
             new_reg = self.get_next_tmp_register()
             
-            if expression_record.operation == 'neg':
+            if expression_record.operation == decaf_ast.Operation.NEGATE:
                 
                 self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.MOVE_IMMED_I, [new_reg, str(1)], "#set to 1 for compare"])
                 
                 self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.ISUB, [new_reg, new_reg, self.generate_expression_code(expression_record.expression, cur_label, var_id_to_register_map)], ""])
                 
-            elif expression_record.operation == "uminus":
+            elif expression_record.operation == decaf_ast.Operation.UMINUS:
                 
-                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.MOVE_IMMED_I, [new_reg, str(-1)], "Store -1 constant for negation"])
-                
-                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.IMUL, [new_reg, new_reg, self.generate_expression_code(expression_record.expression, cur_label, var_id_to_register_map)], "Multiply by -1 to negatve"])
+                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.IMULI, [new_reg, self.generate_expression_code(expression_record.expression, cur_label, var_id_to_register_map), str(-1)], "Multiply by -1 to negatve"])
                 
             return new_reg
     
@@ -343,10 +446,10 @@ class AbstractCodeGenerator:
             new_reg = self.get_next_tmp_register()
             
             
-            arith_ops = {decaf_typecheck.BaseType.INT : {decaf_ast.Operation.ADD : decaf_absmc.Instruction.IADD, "sub" : decaf_absmc.Instruction.ISUB,
-                            "mult" : decaf_absmc.Instruction.IMUL, "div" : decaf_absmc.Instruction.IDIV}, 
-                   "float" : {"add" : decaf_absmc.Instruction.FADD, "sub" : decaf_absmc.Instruction.FSUB,
-                            "mult" : decaf_absmc.Instruction.FMUL, "div" : decaf_absmc.Instruction.FDIV}}
+            arith_ops = {decaf_typecheck.BaseType.INT : {decaf_ast.Operation.ADD : decaf_absmc.Instruction.IADD, decaf_ast.Operation.SUBTRACT : decaf_absmc.Instruction.ISUB,
+                            decaf_ast.Operation.MULTIPLY : decaf_absmc.Instruction.IMUL, decaf_ast.Operation.DIVIDE : decaf_absmc.Instruction.IDIV}, 
+                   decaf_typecheck.BaseType.FLOAT : {decaf_ast.Operation.ADD : decaf_absmc.Instruction.FADD, decaf_ast.Operation.SUBTRACT : decaf_absmc.Instruction.FSUB,
+                            decaf_ast.Operation.MULTIPLY : decaf_absmc.Instruction.FMUL, decaf_ast.Operation.DIVIDE : decaf_absmc.Instruction.FDIV}}
             
             if expression_record.operation in arith_ops[decaf_typecheck.BaseType.INT]:
                 
@@ -355,9 +458,9 @@ class AbstractCodeGenerator:
                 
             
                
-                if expression_record.get_type() == 'float':
+                if expression_record.get_type() == decaf_typecheck.BaseType.FLOAT:
                     
-                    if expression_record.left_expr.get_type() == 'int':
+                    if expression_record.left_expr.get_type() == decaf_typecheck.BaseType.INT:
                         
                         conv_reg = self.get_next_tmp_register()
                         
@@ -365,7 +468,7 @@ class AbstractCodeGenerator:
                         
                         left_reg = conv_reg
                         
-                    if expression_record.right_expr.get_type() == 'int':
+                    if expression_record.right_expr.get_type() == decaf_typecheck.BaseType.INT:
                         conv_reg = self.get_next_tmp_register()
                         
                         self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.ITOF, [conv_reg, right_reg], ""])
@@ -374,54 +477,44 @@ class AbstractCodeGenerator:
                 
                 self.program.append_instruction_to_labeled_section(cur_label, [arith_ops[expression_record.get_type()][expression_record.operation], [new_reg, left_reg, right_reg], "Add op"])
                     
-            if expression_record.operation == 'and':
-                
-                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.IMUL, [new_reg, self.generate_expression_code(expression_record.left_expr, cur_label, var_id_to_register_map), self.generate_expression_code(expression_record.right_expr, cur_label, var_id_to_register_map)], "logical and"])
-                
-            if expression_record.operation == 'or':
-                
-                one_const = self.get_next_tmp_register()
-                
-                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.MOVE_IMMED_I, [one_const, str(1)], "#set to 1 for comparison"])
-                
-                
-                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.IADD, [new_reg, self.generate_expression_code(expression_record.left_expr, cur_label, var_id_to_register_map), self.generate_expression_code(expression_record.right_expr, cur_label, var_id_to_register_map)], ""])
-                
+            if expression_record.operation in (decaf_ast.Operation.AND, decaf_ast.Operation.OR):
                 
+                #the right operand is only evaluated if the left one does not decide the result
+                if expression_record.operation == decaf_ast.Operation.AND:
+                    end_label = self.get_next_short_circuit_label('and')
+                    branch_ins = decaf_absmc.Instruction.BZ
+                else:
+                    end_label = self.get_next_short_circuit_label('or')
+                    branch_ins = decaf_absmc.Instruction.BNZ
                 
-                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.IGEQ, [new_reg, new_reg, one_const], ""])
-                
+                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.MOVE, [new_reg, self.generate_expression_code(expression_record.left_expr, cur_label, var_id_to_register_map)], "left operand"])
+                self.program.append_instruction_to_labeled_section(cur_label, [branch_ins, [new_reg, end_label], "short circuit"])
+                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.MOVE, [new_reg, self.generate_expression_code(expression_record.right_expr, cur_label, var_id_to_register_map)], "right operand"])
+                self.program.append_label_to_labeled_section(cur_label, end_label, "")
                 
-            arith_comps = {"lt" : decaf_absmc.Instruction.ILT, "leq" : decaf_absmc.Instruction.ILEQ, "gt" : decaf_absmc.Instruction.IGT, "geq" : decaf_absmc.Instruction.IGEQ}
+            arith_comps = {decaf_ast.Operation.LESSTHAN : decaf_absmc.Instruction.ILT, decaf_ast.Operation.LESSOREQUAL : decaf_absmc.Instruction.ILEQ, decaf_ast.Operation.GREATERTHAN : decaf_absmc.Instruction.IGT, decaf_ast.Operation.GREATEROREQUAL : decaf_absmc.Instruction.IGEQ}
                 
             if expression_record.operation in arith_comps:
                 self.program.append_instruction_to_labeled_section(cur_label, [arith_comps[expression_record.operation], [new_reg, self.generate_expression_code(expression_record.left_expr, cur_label, var_id_to_register_map), self.generate_expression_code(expression_record.right_expr, cur_label, var_id_to_register_map)], ""])
                 
-            if expression_record.operation == 'eq':
+            if expression_record.operation in (decaf_ast.Operation.EQUALS, decaf_ast.Operation.NOTEQUALS):
                 
                 left = self.generate_expression_code(expression_record.left_expr, cur_label, var_id_to_register_map)
                 right = self.generate_expression_code(expression_record.right_expr, cur_label, var_id_to_register_map)
                 
-                comp_reg = self.get_next_tmp_register()
-            
-                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.IGEQ, [new_reg, left, right], ""])   
-                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.ILEQ, [comp_reg, left, right], ""]) 
-                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.IMUL, [new_reg, new_reg, comp_reg], ""])   
-                    
-            if expression_record.operation == 'neq':
-                left = self.generate_expression_code(expression_record.left_expr, cur_label, var_id_to_register_map)
-                right = self.generate_expression_code(expression_record.right_expr, cur_label, var_id_to_register_map)
+                equality_ins = decaf_absmc.Instruction.IEQ if expression_record.operation == decaf_ast.Operation.EQUALS else decaf_absmc.Instruction.INEQ
                 
-                comp_reg = self.get_next_tmp_register()
-            
-                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.IGT, [new_reg, left, right], ""])   
-                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.ILT, [comp_reg, left, right], ""]) 
-                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.IADD, [new_reg, new_reg, comp_reg], ""])
+                self.program.append_instruction_to_labeled_section(cur_label, [equality_ins, [new_reg, left, right], ""])
             return new_reg
             
             
         
         if isinstance(expression_record, decaf_ast.Method_Call_Expression):
+            
+            inline_record = self.get_inline_method_record(expression_record)
+            
+            if inline_record != None:
+                return self.generate_inline_call_code(expression_record, inline_record, cur_label, var_id_to_register_map)
                    
             if isinstance(expression_record.base_expression, decaf_ast.Class_Reference_Expression):
                 
@@ -435,9 +528,7 @@ class AbstractCodeGenerator:
                     
                     self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.MOVE, [f'a{param_index}', arg_reg], "pass arg into funciton"])
                 
-                call_label = f'M_{expression_record.method_name}_{expression_record.method_id}'
-                
-                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.CALL, [call_label], "call function"])
+                self.append_call_instruction(cur_label, expression_record)
                 
                 self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.MOVE, [func_return_reg, "a0"], "save func result"])
                 
@@ -458,9 +549,7 @@ class AbstractCodeGenerator:
                     
                     self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.MOVE, [f'a{param_index + 1}', var_id_to_register_map[expression_record.arguments[param_index].var]], "pass arg into funciton"])
                 
-                call_label = f'M_{expression_record.method_name}_{expression_record.method_id}'
-                
-                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.CALL, [call_label], "call function"])
+                self.append_call_instruction(cur_label, expression_record)
                 
                 self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.MOVE, [func_return_reg, "a0"], "save func result"])
                 
@@ -468,20 +557,21 @@ class AbstractCodeGenerator:
                          
             else:
                 
+                #a variable or this
+                obj_reg = self.generate_expression_code(expression_record.base_expression, cur_label, var_id_to_register_map)
+                
                 self.save_all_regs_cur_used(cur_label)
                 
                 func_return_reg = self.get_next_tmp_register()
                 
-                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.MOVE, ["a0", var_id_to_register_map[expression_record.base_expression.var]], "move pointer to object to a0"])
+                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.MOVE, ["a0", obj_reg], "move pointer to object to a0"])
                 
                 for param_index in range(0, len(expression_record.arguments)):
                     a = self.generate_expression_code(expression_record.arguments[param_index], cur_label, var_id_to_register_map)
 
                     self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.MOVE, [f'a{param_index + 1}', a], "pass arg into funciton"])
                 
-                call_label = f'M_{expression_record.method_name}_{expression_record.method_id}'
-                
-                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.CALL, [call_label], "call function"])
+                self.append_call_instruction(cur_label, expression_record)
                 
                 self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.MOVE, [func_return_reg, "a0"], "save func result"])
                 
@@ -490,9 +580,187 @@ class AbstractCodeGenerator:
             return func_return_reg   
     
         if isinstance(expression_record, decaf_ast.This_Expression):
-            return "a0"
+            return self.get_this_register()
     
         raise Exception(f"Cannot convert expression: {expression_record}")
+    
+    
+    #a call to a static method, or to an instance method that no class extending the class of the receiver overrides
+    def is_direct_call(self, expression_record) -> bool:
+        
+        if isinstance(expression_record.base_expression, decaf_ast.Class_Reference_Expression):
+            return True
+        
+        return self.hierarchy.has_single_implementation(expression_record.method_id, expression_record.receiver_class_name)
+    
+    #an instance call with several implementations is dispatched on the class of the receiver, which is in a0: the header
+    #of the object gives its method table, and the method is read from the slot it has in every table
+    def append_call_instruction(self, cur_label, expression_record):
+        
+        call_label = f'M_{expression_record.method_name}_{expression_record.method_id}'
+        
+        if isinstance(expression_record.base_expression, decaf_ast.Class_Reference_Expression):
+            self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.CALL, [call_label], "call function"])
+        elif self.is_direct_call(expression_record):
+            self.optimization_stats.devirtualized += 1
+            self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.CALL, [call_label], "call function, single implementation"])
+        else:
+            self.optimization_stats.dispatched += 1
+            slot = self.hierarchy.get_method_slot(expression_record.method_id)
+            self.dispatched_slots.add((expression_record.receiver_class_name, slot))
+            method_reg = self.get_next_tmp_register()
+            self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.HLOADI, [method_reg, "a0", "0"], "method table of the receiver"])
+            self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.HLOADI, [method_reg, method_reg, str(slot)], f"{expression_record.method_name} of the receiver"])
+            self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.CALLR, [method_reg], "dispatch call"])
+    
+    def start_inlining(self):
+        if self.inliner != None:
+            self.inliner.start_method()
+    
+    #the method a call is inlined from, None if the call is generated as a call
+    def get_inline_method_record(self, expression_record):
+        
+        if self.inliner == None:
+            return None
+        
+        method_record = self.ast.get_method_record(expression_record.method_id)
+        
+        if method_record == None:
+            return None
+        
+        is_static_call = isinstance(expression_record.base_expression, decaf_ast.Class_Reference_Expression)
+        if is_static_call != (method_record.applicability == 'static') or not self.is_direct_call(expression_record):
+            return None
+        
+        active_method_ids = [self.cur_method_id] + [frame[0] for frame in self.inline_stack]
+        if not self.inliner.can_inline(method_record, active_method_ids):
+            return None
+        
+        return method_record
+    
+    #a call whose result is returned directly can reuse the frame of the method - only direct calls are turned into jumps,
+    #as they always go to the method that was resolved for them
+    def is_tail_call(self, expression_record) -> bool:
+        
+        if not self.tail_calls or not isinstance(expression_record, decaf_ast.Method_Call_Expression):
+            return False
+        
+        if self.cur_method_id == None or len(self.inline_stack) > 0 or self.get_inline_method_record(expression_record) != None:
+            return False
+        
+        return self.is_direct_call(expression_record)
+    
+    #the arguments are evaluated into temporaries before any argument register is written, as they may read the
+    #parameters of the method. Nothing is saved - the caller of the method saved what it needs and the callee returns to it
+    def generate_tail_call_code(self, expression_record, cur_label, var_id_to_register_map):
+        
+        arguments = list(expression_record.arguments)
+        
+        if not isinstance(expression_record.base_expression, decaf_ast.Class_Reference_Expression):
+            arguments.insert(0, expression_record.base_expression)
+        
+        arg_regs = []
+        
+        for argument in arguments:
+            arg_reg = self.get_next_tmp_register()
+            self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.MOVE, [arg_reg, self.generate_expression_code(argument, cur_label, var_id_to_register_map)], "evaluate arg for tail call"])
+            arg_regs.append(arg_reg)
+        
+        for arg_index, arg_reg in enumerate(arg_regs):
+            self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.MOVE, [f'a{arg_index}', arg_reg], "pass arg into funciton"])
+        
+        call_label = f'M_{expression_record.method_name}_{expression_record.method_id}'
+        
+        self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.JMP, [call_label], "tail call"])
+        self.optimization_stats.tail_calls += 1
+    
+    #the body of the method is generated in place of the call, with fresh temporaries for this, the parameters and the locals
+    #a return moves its value into the result register and jumps to the end of the inlined body
+    def generate_inline_call_code(self, expression_record, method_record : decaf_ast.Method_Record, cur_label, var_id_to_register_map):
+        
+        this_reg = None
+        
+        if method_record.applicability != 'static':
+            this_reg = self.get_next_tmp_register()
+            self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.MOVE, [this_reg, self.generate_expression_code(expression_record.base_expression, cur_label, var_id_to_register_map)], "this of inlined method"])
+        
+        inline_var_id_to_register_map : Dict[int, str] = {}
+        
+        for param_id, argument in zip(method_record.params, expression_record.arguments):
+            param_reg = self.get_next_tmp_register()
+            inline_var_id_to_register_map[param_id] = param_reg
+            self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.MOVE, [param_reg, self.generate_expression_code(argument, cur_label, var_id_to_register_map)], "pass arg into inlined method"])
+        
+        for variable in method_record.get_variable_table().get_variables():
+            if variable[2] == 'local':
+                inline_var_id_to_register_map[variable[0]] = self.get_next_tmp_register()
+        
+        result_reg = self.get_next_tmp_register()
+        end_label = self.get_next_inline_label()
+        
+        self.inliner.add_inlined(method_record)
+        self.inline_stack.append((method_record.id, result_reg, end_label, this_reg))
+        self.generate_body_code(cur_label, method_record.get_method_body().get_statements_list(), inline_var_id_to_register_map)
+        self.inline_stack.pop()
+        
+        self.program.append_label_to_labeled_section(cur_label, end_label, f"end of inlined {method_record.name}")
+        self.optimization_stats.inlined += 1
+        
+        return result_reg
+    
+    
+    #branches to false_label if the condition is false and falls through otherwise
+    #&&, || and ! are turned into branches, so no boolean value is computed for them
+    def generate_branch_if_false(self, expression_record, false_label, cur_label, var_id_to_register_map):
+        
+        if isinstance(expression_record, decaf_ast.Binary_Expression) and expression_record.operation == decaf_ast.Operation.AND:
+            self.generate_branch_if_false(expression_record.left_expr, false_label, cur_label, var_id_to_register_map)
+            self.generate_branch_if_false(expression_record.right_expr, false_label, cur_label, var_id_to_register_map)
+            
+        elif isinstance(expression_record, decaf_ast.Binary_Expression) and expression_record.operation == decaf_ast.Operation.OR:
+            true_label = self.get_next_short_circuit_label('or')
+            self.generate_branch_if_true(expression_record.left_expr, true_label, cur_label, var_id_to_register_map)
+            self.generate_branch_if_false(expression_record.right_expr, false_label, cur_label, var_id_to_register_map)
+            self.program.append_label_to_labeled_section(cur_label, true_label, "")
+            
+        elif isinstance(expression_record, decaf_ast.Unary_Expression) and expression_record.operation == decaf_ast.Operation.NEGATE:
+            self.generate_branch_if_true(expression_record.expression, false_label, cur_label, var_id_to_register_map)
+            
+        elif isinstance(expression_record, decaf_ast.Binary_Expression) and expression_record.operation in COMPARE_BRANCHES:
+            self.generate_compare_branch(decaf_absmc.INVERTED_BRANCHES[COMPARE_BRANCHES[expression_record.operation]], expression_record, false_label, "condition not satisfied", cur_label, var_id_to_register_map)
+            
+        else:
+            condition_reg = self.generate_expression_code(expression_record, cur_label, var_id_to_register_map)
+            self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.BZ, [condition_reg, false_label], "condition not satisfied"])
+            
+    #branches to true_label if the condition is true and falls through otherwise
+    def generate_branch_if_true(self, expression_record, true_label, cur_label, var_id_to_register_map):
+        
+        if isinstance(expression_record, decaf_ast.Binary_Expression) and expression_record.operation == decaf_ast.Operation.OR:
+            self.generate_branch_if_true(expression_record.left_expr, true_label, cur_label, var_id_to_register_map)
+            self.generate_branch_if_true(expression_record.right_expr, true_label, cur_label, var_id_to_register_map)
+            
+        elif isinstance(expression_record, decaf_ast.Binary_Expression) and expression_record.operation == decaf_ast.Operation.AND:
+            false_label = self.get_next_short_circuit_label('and')
+            self.generate_branch_if_false(expression_record.left_expr, false_label, cur_label, var_id_to_register_map)
+            self.generate_branch_if_true(expression_record.right_expr, true_label, cur_label, var_id_to_register_map)
+            self.program.append_label_to_labeled_section(cur_label, false_label, "")
+            
+        elif isinstance(expression_record, decaf_ast.Unary_Expression) and expression_record.operation == decaf_ast.Operation.NEGATE:
+            self.generate_branch_if_false(expression_record.expression, true_label, cur_label, var_id_to_register_map)
+            
+        elif isinstance(expression_record, decaf_ast.Binary_Expression) and expression_record.operation in COMPARE_BRANCHES:
+            self.generate_compare_branch(COMPARE_BRANCHES[expression_record.operation], expression_record, true_label, "condition satisfied", cur_label, var_id_to_register_map)
+            
+        else:
+            condition_reg = self.generate_expression_code(expression_record, cur_label, var_id_to_register_map)
+            self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.BNZ, [condition_reg, true_label], "condition satisfied"])
+    
+    #a comparison that only decides a branch compares its operands in the branch itself
+    def generate_compare_branch(self, branch_ins, expression_record, label, comment, cur_label, var_id_to_register_map):
+        left = self.generate_expression_code(expression_record.left_expr, cur_label, var_id_to_register_map)
+        right = self.generate_expression_code(expression_record.right_expr, cur_label, var_id_to_register_map)
+        self.program.append_instruction_to_labeled_section(cur_label, [branch_ins, [left, right, label], comment])
         
         
     
@@ -522,10 +790,8 @@ class AbstractCodeGenerator:
                 
                 self.program.append_label_to_labeled_section(cur_label, condition_label, "for loop")
                 
-                condition_reg = self.generate_expression_code(statement.loop_condition, cur_label, var_id_to_register_map)
-                
                 if not isinstance(statement.loop_condition, decaf_ast.Skip_Statement):
-                    self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.BZ, [condition_reg, end_label], ""])
+                    self.generate_branch_if_false(statement.loop_condition, end_label, cur_label, var_id_to_register_map)
                 
                 self.program.append_label_to_labeled_section(cur_label, body_label, "")
                 
@@ -551,9 +817,7 @@ class AbstractCodeGenerator:
                 
                 self.program.append_label_to_labeled_section(cur_label, condition_label, "")
                 
-                condition_reg = self.generate_expression_code(statement.loop_condition, cur_label, var_id_to_register_map)
-                
-                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.BZ, [condition_reg, end_label], ''])
+                self.generate_branch_if_false(statement.loop_condition, end_label, cur_label, var_id_to_register_map)
                 
                 self.program.append_label_to_labeled_section(cur_label, body_label, "body of while loop")
                 
@@ -568,10 +832,7 @@ class AbstractCodeGenerator:
                 
                 (then_label, else_label, end_label) = self.get_next_if_control_flow_labels()
                 
-                condition_reg = self.generate_expression_code(statement.if_expression, cur_label, var_id_to_register_map)
-                    
-                    
-                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.BZ, [condition_reg, else_label], "if statement not satisfied"])
+                self.generate_branch_if_false(statement.if_expression, else_label, cur_label, var_id_to_register_map)
                 
                 self.program.append_label_to_labeled_section(cur_label, then_label, "then part of if statement")
                 
@@ -590,7 +851,21 @@ class AbstractCodeGenerator:
                 self.generate_expression_code(statement.get_expression(), cur_label, var_id_to_register_map)
            
             
-            if isinstance(statement, decaf_ast.Return_Statement):
+            if isinstance(statement, decaf_ast.Return_Statement) and len(self.inline_stack) > 0:
+                
+                method_id, result_reg, end_label, this_reg = self.inline_stack[-1]
+                
+                if not isinstance(statement.expression, decaf_ast.Skip_Statement):
+                    new_reg = self.generate_expression_code(statement.expression, cur_label, var_id_to_register_map)
+                    self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.MOVE, [result_reg, new_reg], "move for inlined return"])
+                
+                self.program.append_instruction_to_labeled_section(cur_label, [decaf_absmc.Instruction.JMP, [end_label], "return from inlined method"])
+            
+            elif isinstance(statement, decaf_ast.Return_Statement) and self.is_tail_call(statement.expression):
+                
+                self.generate_tail_call_code(statement.expression, cur_label, var_id_to_register_map)
+            
+            elif isinstance(statement, decaf_ast.Return_Statement):
                 
                 if not isinstance(statement.expression, decaf_ast.Skip_Statement): 
                     new_reg = self.generate_expression_code(statement.expression, cur_label, var_id_to_register_map)     
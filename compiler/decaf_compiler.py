@@ -2,14 +2,16 @@ import sys
 import decaf_lexer
 import decaf_parser
 import decaf_codegen
+import decaf_regalloc
+import decaf_inline
 import argparse
 
-def modify_file_extension(file_name): 
+def modify_file_extension(file_name, extension = '.ami'): 
     if file_name.endswith('.decaf'): 
-        return file_name[:-6] + '.ami'
-    return file_name + '.ami'
+        return file_name[:-6] + extension
+    return file_name + extension
 
-def compile(infile, outfile):
+def compile(infile, outfile, binary = False, register_budget = decaf_regalloc.DEFAULT_REGISTER_BUDGET, save_live_regs_only = True, optimize = True, show_stats = False, inline_budget = decaf_inline.DEFAULT_INLINE_BUDGET, tail_calls = True, remove_unreachable = True):
         
     data = infile.read()
     
@@ -19,10 +21,16 @@ def compile(infile, outfile):
         print("\033[31mCompilation Failed\033[0m", file=sys.stderr)
         sys.exit(1)
         
-    gen = decaf_codegen.AbstractCodeGenerator(ast)
+    gen = decaf_codegen.AbstractCodeGenerator(ast, register_budget, save_live_regs_only, optimize, inline_budget, tail_calls, remove_unreachable)
     program = gen.generate_code()
         
-    program.print_to_file(outfile)
+    if binary:
+        program.write_object_file(outfile)
+    else:
+        program.print_to_file(outfile)
+        
+    if show_stats:
+        print(gen.optimization_stats, file=sys.stderr)
     
 
     print(f'\033[32mCompilation Succeeded\033[0m', file=sys.stderr)
@@ -38,23 +46,40 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="A compiler for the programming language Decaf")
     
     parser.add_argument("--infile", type=str, help="input file - will read from stdin if none specified")
+    parser.add_argument("--register-budget", type=int, default=decaf_regalloc.DEFAULT_REGISTER_BUDGET, help="number of temporary registers the register allocator aims for")
+    parser.add_argument("--no-register-allocation", action="store_true", help="keep a fresh temporary for every value")
+    parser.add_argument("--save-all-registers", action="store_true", help="save every register in use around a call, not only the live ones")
+    parser.add_argument("--no-optimize", action="store_true", help="do not fold constants or remove dead code")
+    parser.add_argument("--optimization-stats", action="store_true", help="report what the optimizer did on stderr")
+    parser.add_argument("--inline-budget", type=int, default=decaf_inline.DEFAULT_INLINE_BUDGET, help="size of the largest method body that is inlined at a call site - a method takes in at most 8 times this much inlined code")
+    parser.add_argument("--no-inline", action="store_true", help="generate every method call as a call")
+    parser.add_argument("--no-tail-calls", action="store_true", help="generate calls whose result is returned as calls instead of jumps")
+    parser.add_argument("--keep-unreachable", action="store_true", help="generate every method and constructor, even those main can never reach")
+    parser.add_argument("--binary", action="store_true", help="write a binary AMI object file (.amo) instead of AMI text")
     
     
     
     
     args = parser.parse_args()
     
+    register_budget = None if args.no_register_allocation else args.register_budget
+    inline_budget = None if args.no_inline else args.inline_budget
+    
     if args.infile == None:
-        compile(sys.stdin, sys.stdout)
+        compile(sys.stdin, sys.stdout.buffer if args.binary else sys.stdout, args.binary, register_budget, not args.save_all_registers, not args.no_optimize, args.optimization_stats, inline_budget, not args.no_tail_calls, not args.keep_unreachable)
     else:
         try:
             read_file = open(args.infile, 'r')
-            out_file = open(modify_file_extension(args.infile), 'w')
-            compile(read_file, out_file)
-
-            
-        except Exception:
-           print("Could not open file")
+            if args.binary:
+                out_file = open(modify_file_extension(args.infile, '.amo'), 'wb')
+            else:
+                out_file = open(modify_file_extension(args.infile), 'w')
+        except OSError:
+            print("Could not open file", file=sys.stderr)
+            sys.exit(1)
+        
+        #errors inside the compiler propagate - only a file that cannot be opened is reported here
+        compile(read_file, out_file, args.binary, register_budget, not args.save_all_registers, not args.no_optimize, args.optimization_stats, inline_budget, not args.no_tail_calls, not args.keep_unreachable)
     
    
             
\ No newline at end of file
@@ -0,0 +1,50 @@
+import decaf_ast
+import decaf_callgraph
+from typing import Dict, List
+
+#largest method body, counted in statements and expressions, that is inlined at its call sites
+DEFAULT_INLINE_BUDGET = 16
+
+#a method takes in at most this many budgets of inlined code, including bodies inlined into inlined bodies - without a
+#limit on the total, a chain of small methods that each call the next twice grows exponentially with its length
+INLINE_GROWTH_FACTOR = 8
+
+
+#number of statements and expressions of a method body - blocks and skips do not count
+def get_size(node) -> int:
+    return sum(1 for child in decaf_callgraph.walk(node) if not isinstance(child, (list, decaf_ast.Block_Stmt, decaf_ast.Skip_Statement, decaf_ast.Expression_Statement)))
+
+
+#decides which methods are small enough to be inlined at their call sites
+#only direct calls are inlined - a call that may dispatch to an overriding method is left to the call
+class Inliner:
+
+    def __init__(self, budget : int = DEFAULT_INLINE_BUDGET):
+        self.budget = budget
+        self.growth_budget = budget * INLINE_GROWTH_FACTOR
+        #size of the code inlined into the method being generated so far
+        self.growth = 0
+        self.method_sizes : Dict[int, int] = {}
+
+    def get_method_size(self, method_record : decaf_ast.Method_Record) -> int:
+        if method_record.id not in self.method_sizes:
+            self.method_sizes[method_record.id] = get_size(method_record.get_method_body())
+        return self.method_sizes[method_record.id]
+
+    #called before the code of each method and constructor is generated
+    def start_method(self):
+        self.growth = 0
+
+    #called for every body that is inlined into the method being generated
+    def add_inlined(self, method_record : decaf_ast.Method_Record):
+        self.growth += self.get_method_size(method_record)
+
+    #active_method_ids - the method being generated and the methods being inlined into it, which keeps recursion out
+    def can_inline(self, method_record : decaf_ast.Method_Record, active_method_ids : List[int]) -> bool:
+
+        if method_record.id in active_method_ids:
+            return False
+
+        size = self.get_method_size(method_record)
+
+        return size <= self.budget and self.growth + size <= self.growth_budget
@@ -0,0 +1,736 @@
+import re
+import math
+import decaf_absmc
+import decaf_regalloc
+import decaf_cfg
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+
+Instruction = decaf_absmc.Instruction
+
+
+class OptimizationStats:
+
+    def __init__(self):
+        self.folded = 0
+        self.folded_branches = 0
+        self.immediates = 0
+        self.removed = 0
+        self.reused = 0
+        self.loads_removed = 0
+        self.hoisted = 0
+        self.rotated = 0
+        self.inlined = 0
+        self.tail_calls = 0
+        self.devirtualized = 0
+        self.dispatched = 0
+        self.unreachable_methods = 0
+        #number of times each peephole rule fired, by rule name
+        self.peephole_hits : Dict[str, int] = {}
+
+    def __str__(self):
+        res = f'{self.unreachable_methods} unreachable methods removed, {self.devirtualized} calls devirtualized, {self.dispatched} calls dispatched, {self.inlined} calls inlined, {self.tail_calls} tail calls, {self.folded} instructions folded, {self.folded_branches} branches folded, {self.immediates} immediate operands, {self.reused} values reused, {self.loads_removed} loads removed, {self.hoisted} instructions hoisted out of loops, {self.rotated} loops rotated, {self.removed} instructions removed'
+        for name, hits in self.peephole_hits.items():
+            res += f'\npeephole {name}: {hits}'
+        return res
+
+
+#java semantics: the quotient is truncated towards zero - must agree with the abstract machine
+def integer_divide(a : int, b : int) -> int:
+    quotient = abs(a) // abs(b)
+    return quotient if (a < 0) == (b < 0) else -quotient
+
+def integer_modulo(a : int, b : int) -> int:
+    return a - b * integer_divide(a, b)
+
+
+#instructions of the form 'op r1, r2, r3' with r1 := r2 op r3 that can be evaluated at compile time
+#integer and float results are kept apart so that the folded value is moved with the right move_immed
+FOLDABLE_OPERATIONS = {
+    Instruction.IADD : lambda a, b: a + b,
+    Instruction.ISUB : lambda a, b: a - b,
+    Instruction.IMUL : lambda a, b: a * b,
+    Instruction.IDIV : integer_divide,
+    Instruction.IMOD : integer_modulo,
+    Instruction.IGT : lambda a, b: int(a > b),
+    Instruction.IGEQ : lambda a, b: int(a >= b),
+    Instruction.ILT : lambda a, b: int(a < b),
+    Instruction.ILEQ : lambda a, b: int(a <= b),
+    Instruction.IEQ : lambda a, b: int(a == b),
+    Instruction.INEQ : lambda a, b: int(a != b),
+    Instruction.FADD : lambda a, b: a + b,
+    Instruction.FSUB : lambda a, b: a - b,
+    Instruction.FMUL : lambda a, b: a * b,
+    Instruction.FDIV : lambda a, b: a / b,
+    Instruction.FGT : lambda a, b: int(a > b),
+    Instruction.FGEQ : lambda a, b: int(a >= b),
+    Instruction.FLT : lambda a, b: int(a < b),
+    Instruction.FLEQ : lambda a, b: int(a <= b),
+}
+
+#instructions with an immediate last operand and the register form they compute
+IMMEDIATE_OPERATIONS = {Instruction.IADDI : Instruction.IADD, Instruction.IMULI : Instruction.IMUL}
+
+#whether a conditional branch is taken, given the values of the registers it reads
+BRANCH_CONDITIONS = {
+    Instruction.BZ : lambda a: a == 0,
+    Instruction.BNZ : lambda a: a != 0,
+    Instruction.BEQ : lambda a, b: a == b,
+    Instruction.BNEQ : lambda a, b: a != b,
+    Instruction.BLT : lambda a, b: a < b,
+    Instruction.BLEQ : lambda a, b: a <= b,
+    Instruction.BGT : lambda a, b: a > b,
+    Instruction.BGEQ : lambda a, b: a >= b,
+}
+
+#division by zero is a run time error, so it is never folded
+DIVISIONS = {Instruction.IDIV, Instruction.IMOD, Instruction.FDIV}
+
+#instructions without side effects - they can be removed if their result is never read
+PURE_INSTRUCTIONS = (set(FOLDABLE_OPERATIONS) - DIVISIONS) | set(IMMEDIATE_OPERATIONS) | {Instruction.MOVE_IMMED_I, Instruction.MOVE_IMMED_F, Instruction.MOVE, Instruction.FTOI, Instruction.ITOF}
+
+#float immediates the assembler accepts
+FLOAT_IMMEDIATE = re.compile(r'-?[0-9]+\.[0-9]+')
+
+
+def format_float(value : float) -> Optional[str]:
+    text = repr(float(value))
+    if FLOAT_IMMEDIATE.fullmatch(text):
+        return text
+    return None
+
+#the instruction that loads a constant into a register, None if the constant cannot be written as an immediate
+def make_constant_instruction(register : str, value, comment : str) -> Optional[List]:
+    if isinstance(value, float):
+        text = format_float(value)
+        if text == None:
+            return None
+        return [Instruction.MOVE_IMMED_F, [register, text], comment]
+    return [Instruction.MOVE_IMMED_I, [register, str(value)], comment]
+
+#the immediate form of an instruction with an integer constant operand, None if it has none
+#  iadd d, a, c  isub d, a, c  imul d, a, c  hload d, b, c  hstore b, c, s
+def make_immediate_instruction(instruction_tuple : List, constants : Dict[str, object]) -> Optional[List]:
+
+    instruction, args, comment = instruction_tuple
+
+    def get_int(register : str) -> Optional[int]:
+        value = constants.get(register)
+        return value if isinstance(value, int) else None
+
+    if instruction in (Instruction.IADD, Instruction.IMUL):
+        immediate_instruction = Instruction.IADDI if instruction == Instruction.IADD else Instruction.IMULI
+        if get_int(args[2]) != None:
+            return [immediate_instruction, [args[0], args[1], str(get_int(args[2]))], comment]
+        if get_int(args[1]) != None:
+            return [immediate_instruction, [args[0], args[2], str(get_int(args[1]))], comment]
+
+    elif instruction == Instruction.ISUB and get_int(args[2]) != None:
+        return [Instruction.IADDI, [args[0], args[1], str(-get_int(args[2]))], comment]
+
+    elif instruction == Instruction.HLOAD and get_int(args[2]) != None:
+        return [Instruction.HLOADI, [args[0], args[1], str(get_int(args[2]))], comment]
+
+    elif instruction == Instruction.HSTORE and get_int(args[1]) != None:
+        return [Instruction.HSTOREI, [args[0], str(get_int(args[1])), args[2]], comment]
+
+    return None
+
+
+#evaluates constant instructions and propagates the constants they produce through straight-line code
+#every label is a possible join point and a call may change any register, so both forget all constants
+#an instruction that is left with a single integer constant operand is rewritten to its immediate form, so that the
+#instruction loading the constant can be removed as dead code
+def fold_constants(section : List, stats : OptimizationStats) -> None:
+
+    constants : Dict[str, object] = {}
+    never_taken : Set[int] = set()
+
+    for index, instruction_tuple in enumerate(section):
+
+        if decaf_absmc.is_label_entry(instruction_tuple):
+            constants.clear()
+            continue
+
+        instruction, args = instruction_tuple[0], instruction_tuple[1]
+
+        if instruction in decaf_absmc.CALLS:
+            constants.clear()
+            continue
+
+        if instruction in BRANCH_CONDITIONS and all(arg in constants for arg in args[:-1]):
+            if BRANCH_CONDITIONS[instruction](*[constants[arg] for arg in args[:-1]]):
+                section[index] = [Instruction.JMP, [args[-1]], instruction_tuple[2]]
+            else:
+                never_taken.add(index)
+            stats.folded_branches += 1
+            continue
+
+        value = None
+
+        if instruction == Instruction.MOVE_IMMED_I:
+            value = int(args[1])
+
+        elif instruction == Instruction.MOVE_IMMED_F:
+            value = float(args[1])
+
+        elif instruction in (Instruction.MOVE, Instruction.FTOI, Instruction.ITOF) and args[1] in constants:
+            value = constants[args[1]]
+            if instruction == Instruction.FTOI:
+                value = int(value) if math.isfinite(value) else None
+            elif instruction == Instruction.ITOF:
+                value = float(value)
+
+        elif instruction in FOLDABLE_OPERATIONS and args[1] in constants and args[2] in constants:
+            if not (instruction in DIVISIONS and constants[args[2]] == 0):
+                value = FOLDABLE_OPERATIONS[instruction](constants[args[1]], constants[args[2]])
+
+        elif instruction in IMMEDIATE_OPERATIONS and args[1] in constants:
+            value = FOLDABLE_OPERATIONS[IMMEDIATE_OPERATIONS[instruction]](constants[args[1]], int(args[2]))
+
+        else:
+            immediate_instruction = make_immediate_instruction(instruction_tuple, constants)
+            if immediate_instruction != None:
+                section[index] = immediate_instruction
+                stats.immediates += 1
+
+        for register in decaf_absmc.get_registers_written(instruction, args):
+            constants.pop(register, None)
+
+        if instruction == Instruction.RESTORE:
+            constants.pop(args[0], None)
+
+        if value == None:
+            continue
+
+        constants[args[0]] = value
+
+        if instruction not in (Instruction.MOVE_IMMED_I, Instruction.MOVE_IMMED_F):
+            constant_instruction = make_constant_instruction(args[0], value, instruction_tuple[2])
+            if constant_instruction != None:
+                section[index] = constant_instruction
+                stats.folded += 1
+
+    section[:] = [instruction_tuple for index, instruction_tuple in enumerate(section) if index not in never_taken]
+
+
+COMMUTATIVE_OPERATIONS = {Instruction.IADD, Instruction.IMUL, Instruction.IEQ, Instruction.INEQ, Instruction.FADD, Instruction.FMUL}
+
+#instructions whose result only depends on their operands, so an earlier result can be reused
+#hload is not one of them, as the heap may change in between
+VALUE_OPERATIONS = set(FOLDABLE_OPERATIONS) | set(IMMEDIATE_OPERATIONS) | {Instruction.FTOI, Instruction.ITOF}
+
+
+#registers of a basic block by the number of the value they hold
+class ValueTable:
+
+    def __init__(self):
+        self.value_numbers : Dict[str, int] = {}
+        self.holders : Dict[int, List[str]] = {}
+        self.expressions : Dict[tuple, int] = {}
+        #value numbers of constants and their values
+        self.constants : Dict[int, object] = {}
+        #known heap contents: (base value number, offset value number) -> value number of the contents
+        self.memory : Dict[Tuple[int, int], int] = {}
+        self.next_value_number = 0
+
+    def clear(self):
+        self.value_numbers.clear()
+        self.holders.clear()
+        self.expressions.clear()
+        self.constants.clear()
+        self.memory.clear()
+
+    #value number of an integer constant, which need not be held by any register
+    def get_constant_number(self, value : int) -> int:
+        key = ('i', value)
+        if key not in self.expressions:
+            self.expressions[key] = self.new_value_number()
+            self.constants[self.expressions[key]] = value
+        return self.expressions[key]
+
+    def new_value_number(self) -> int:
+        self.next_value_number += 1
+        self.holders[self.next_value_number] = []
+        return self.next_value_number
+
+    #registers read before they are written in the block hold values of their own
+    def get_value_number(self, register : str) -> int:
+        if register not in self.value_numbers:
+            self.define(register, self.new_value_number())
+        return self.value_numbers[register]
+
+    #the first register that still holds the value of the given register
+    def get_holder(self, register : str) -> str:
+        return self.holders[self.get_value_number(register)][0]
+
+    def define(self, register : str, value_number : int):
+        if register in self.value_numbers:
+            self.holders[self.value_numbers[register]].remove(register)
+        self.value_numbers[register] = value_number
+        self.holders[value_number].append(register)
+
+    #a store may write to any known location unless both offsets are known to differ - field accesses stay within
+    #their object, so different fields never alias, but two base registers may point to the same object
+    def store(self, base : int, offset : int, value : int):
+        for location in list(self.memory):
+            if not (location[1] in self.constants and offset in self.constants and self.constants[location[1]] != self.constants[offset]):
+                del self.memory[location]
+        self.memory[(base, offset)] = value
+
+
+#local value numbering: within a basic block, a computation whose value is already held in a register is replaced by
+#a move from it, and reads of a register go to the first register holding the same value, which leaves the copies
+#for remove_dead_code
+#heap locations are numbered as well, so a load of a location that was loaded or stored before is replaced by a move
+def number_values(section : List, stats : OptimizationStats) -> None:
+
+    cfg = decaf_cfg.ControlFlowGraph(section)
+
+    for block in cfg.blocks:
+
+        table = ValueTable()
+
+        for position, instruction_tuple in enumerate(block.instructions):
+
+            instruction, args, comment = instruction_tuple
+
+            if instruction in decaf_absmc.CALLS:
+                table.clear()
+                continue
+
+            if instruction == Instruction.RESTORE:
+                table.define(args[0], table.new_value_number())
+                continue
+
+            if instruction == Instruction.SAVE:
+                continue
+
+            kinds = decaf_absmc.get_operand_kinds(instruction)
+            reads_first = instruction in decaf_absmc.READS_FIRST_OPERAND
+            args = [table.get_holder(arg) if kind == 'r' and (operand > 0 or reads_first) else arg for operand, (kind, arg) in enumerate(zip(kinds, args))]
+
+            key = None
+            if instruction == Instruction.MOVE_IMMED_I:
+                key = ('i', int(args[1]))
+            elif instruction == Instruction.MOVE_IMMED_F:
+                key = ('f', float(args[1]))
+            elif instruction in VALUE_OPERATIONS:
+                operands = [table.get_value_number(arg) if kind == 'r' else table.get_constant_number(int(arg)) for kind, arg in zip(kinds[1:], args[1:])]
+                if instruction in COMMUTATIVE_OPERATIONS:
+                    operands.sort()
+                key = (instruction, *operands)
+
+            if instruction == Instruction.MOVE:
+                table.define(args[0], table.get_value_number(args[1]))
+
+            elif instruction == Instruction.HSTORE:
+                table.store(table.get_value_number(args[0]), table.get_value_number(args[1]), table.get_value_number(args[2]))
+
+            elif instruction == Instruction.HSTOREI:
+                table.store(table.get_value_number(args[0]), table.get_constant_number(int(args[1])), table.get_value_number(args[2]))
+
+            elif instruction in (Instruction.HLOAD, Instruction.HLOADI):
+                offset = table.get_value_number(args[2]) if instruction == Instruction.HLOAD else table.get_constant_number(int(args[2]))
+                location = (table.get_value_number(args[1]), offset)
+                if location in table.memory and len(table.holders[table.memory[location]]) > 0:
+                    value_number = table.memory[location]
+                    instruction, args = Instruction.MOVE, [args[0], table.holders[value_number][0]]
+                    table.define(args[0], value_number)
+                    stats.loads_removed += 1
+                else:
+                    table.define(args[0], table.new_value_number())
+                    table.memory[location] = table.value_numbers[args[0]]
+
+            elif key != None and key in table.expressions and len(table.holders[table.expressions[key]]) > 0:
+                value_number = table.expressions[key]
+                instruction, args = Instruction.MOVE, [args[0], table.holders[value_number][0]]
+                table.define(args[0], value_number)
+                stats.reused += 1
+
+            elif key != None:
+                #the value may already be numbered without being held by any register
+                if key in table.expressions:
+                    value_number = table.expressions[key]
+                else:
+                    value_number = table.new_value_number()
+                    table.expressions[key] = value_number
+                if instruction in (Instruction.MOVE_IMMED_I, Instruction.MOVE_IMMED_F):
+                    table.constants[value_number] = key[1]
+                table.define(args[0], value_number)
+
+            else:
+                if instruction == Instruction.HALLOC:
+                    table.memory.clear()
+                for register in decaf_absmc.get_registers_written(instruction, args):
+                    table.define(register, table.new_value_number())
+
+            block.instructions[position] = [instruction, args, comment]
+
+    section[:] = cfg.to_section()
+
+
+#loop-invariant code motion: pure instructions of a loop whose operands do not change inside it are moved into a
+#preheader in front of the loop header. Loops are handled innermost first, so invariants can move out of several loops.
+def hoist_loop_invariants(section : List, stats : OptimizationStats) -> None:
+
+    cfg = decaf_cfg.ControlFlowGraph(section)
+    headers = [get_back_edge_labels(cfg, loop)[0] for loop in sorted(cfg.loops, key=lambda loop: -loop.depth) if len(get_back_edge_labels(cfg, loop)) > 0]
+
+    for header_label in headers:
+        cfg = decaf_cfg.ControlFlowGraph(section)
+        header = cfg.label_to_block[header_label]
+        loop = cfg.blocks[header].loop
+        if loop != None and loop.header == header and hoist_loop(cfg, loop, stats):
+            section[:] = cfg.to_section()
+
+
+#labels of the loop header that are jumped to from inside the loop
+def get_back_edge_labels(cfg : decaf_cfg.ControlFlowGraph, loop : decaf_cfg.Loop) -> List[str]:
+    header_labels = cfg.blocks[loop.header].get_label_names()
+    targets = {cfg.blocks[index].get_terminator()[1][-1] for index in loop.body if cfg.blocks[index].get_terminator() != None}
+    return [label for label in header_labels if label in targets]
+
+
+def hoist_loop(cfg : decaf_cfg.ControlFlowGraph, loop : decaf_cfg.Loop, stats : OptimizationStats) -> bool:
+
+    header = cfg.blocks[loop.header]
+    inside_labels = get_back_edge_labels(cfg, loop)
+
+    #the preheader goes between the labels used from outside and the ones used by the loop, which needs them to be disjoint
+    #and the loop to not fall through into its header
+    outside_targets = {cfg.blocks[index].get_terminator()[1][-1] for index in header.predecessors if index not in loop.body and cfg.blocks[index].get_terminator() != None}
+    if len(outside_targets.intersection(inside_labels)) > 0 or (loop.header - 1 in loop.body and cfg.blocks[loop.header - 1].falls_through()):
+        return False
+
+    section = cfg.to_section()
+    live_in = compute_live_temporaries(section, False)[0]
+
+    block_starts : Dict[int, int] = {}
+    position = 0
+    for block in cfg.blocks:
+        block_starts[block.index] = position
+        position += len(block.labels) + len(block.instructions)
+
+    #registers saved around every call inside the loop - a hoisted value the loop reads has to survive all of them, and as
+    #this runs after dead saves are removed, only such values that already live across the calls are hoisted
+    saved_around_call : Dict[int, Set[str]] = {}
+    #a matched restore puts back the value its save stored, so it does not define the register
+    restores : Set[int] = set()
+    for save_index, restore_index in decaf_regalloc.match_saves_and_restores(section):
+        restores.add(id(section[restore_index]))
+        for index in range(save_index + 1, restore_index):
+            if section[index][0] in decaf_absmc.CALLS:
+                saved_around_call.setdefault(id(section[index]), set()).add(section[save_index][1][0])
+
+    loop_instructions = [instruction_tuple for index in sorted(loop.body) for instruction_tuple in cfg.blocks[index].instructions]
+    calls = [instruction_tuple for instruction_tuple in loop_instructions if instruction_tuple[0] in decaf_absmc.CALLS]
+
+    definitions : Dict[str, int] = {}
+    for instruction_tuple in loop_instructions:
+        if id(instruction_tuple) in restores:
+            continue
+        for register in decaf_absmc.get_registers_written(instruction_tuple[0], instruction_tuple[1]):
+            definitions[register] = definitions.get(register, 0) + 1
+        if instruction_tuple[0] in decaf_absmc.CALLS:
+            definitions['a0'] = definitions.get('a0', 0) + 1
+
+    #a hoisted value must not be needed before its definition or after the loop, where the loop may not have defined it
+    unavailable = set(live_in[block_starts[loop.header]])
+    for index in loop.get_exits(cfg):
+        unavailable |= live_in[block_starts[index]]
+
+    hoisted : List[List] = []
+    hoisted_registers : Set[str] = set()
+
+    changed = True
+    while changed:
+        changed = False
+        for instruction_tuple in loop_instructions:
+
+            if instruction_tuple[0] not in PURE_INSTRUCTIONS or any(instruction_tuple is other for other in hoisted):
+                continue
+
+            register = instruction_tuple[1][0]
+            reads = decaf_absmc.get_registers_read(instruction_tuple[0], instruction_tuple[1])
+
+            if not decaf_regalloc.is_temporary(register) or definitions[register] != 1 or register in unavailable:
+                continue
+            if any(read in definitions and read not in hoisted_registers for read in reads):
+                continue
+
+            hoisted.append(instruction_tuple)
+            hoisted_registers.add(register)
+            changed = True
+
+    #a hoisted value that the rest of the loop reads has to survive every call in it - one that is not saved around them
+    #stays in the loop, and so does everything hoisted that reads it
+    changed = True
+    while changed:
+        changed = False
+        remaining_reads = {read for instruction_tuple in loop_instructions if not any(instruction_tuple is other for other in hoisted) for read in decaf_absmc.get_registers_read(instruction_tuple[0], instruction_tuple[1])}
+        for instruction_tuple in hoisted:
+            register = instruction_tuple[1][0]
+            reads = decaf_absmc.get_registers_read(instruction_tuple[0], instruction_tuple[1])
+            if (register in remaining_reads and any(register not in saved_around_call.get(id(call), set()) for call in calls)) or any(read in definitions and read not in hoisted_registers for read in reads):
+                hoisted.remove(instruction_tuple)
+                hoisted_registers.discard(register)
+                changed = True
+                break
+
+    if len(hoisted) == 0:
+        return False
+
+    for index in loop.body:
+        cfg.blocks[index].instructions = [instruction_tuple for instruction_tuple in cfg.blocks[index].instructions if not any(instruction_tuple is other for other in hoisted)]
+
+    preheader = decaf_cfg.BasicBlock(len(cfg.blocks))
+    preheader.labels = [label for label in header.labels if label[0][:-1] not in inside_labels]
+    preheader.instructions = hoisted
+    header.labels = [label for label in header.labels if label[0][:-1] in inside_labels]
+    cfg.blocks.insert(cfg.blocks.index(header), preheader)
+
+    stats.hoisted += len(hoisted)
+    return True
+
+
+#loop rotation: a loop whose header tests the condition and whose last block jumps back to it
+#    H: cond  bz c, E    B: body  jmp H    E:
+#is laid out with the test at the bottom, so every iteration runs one branch instead of a branch and a jump
+#    jmp H    B: body    H: cond  bnz c, B    E:
+def rotate_loops(section : List, stats : OptimizationStats) -> None:
+
+    changed = True
+    while changed:
+        changed = False
+        cfg = decaf_cfg.ControlFlowGraph(section)
+        for loop in cfg.loops:
+            if rotate_loop(cfg, loop):
+                section[:] = cfg.to_section()
+                stats.rotated += 1
+                changed = True
+                break
+
+
+def rotate_loop(cfg : decaf_cfg.ControlFlowGraph, loop : decaf_cfg.Loop) -> bool:
+
+    header = cfg.blocks[loop.header]
+    test = header.get_terminator()
+
+    if test == None or test[0] not in decaf_absmc.CONDITIONAL_BRANCHES:
+        return False
+
+    exit_index = cfg.label_to_block.get(test[1][-1])
+
+    #the loop has to be laid out as one run of blocks from the header to the latch, followed by the exit
+    if exit_index == None or exit_index <= loop.header + 1 or set(range(loop.header, exit_index)) != loop.body:
+        return False
+
+    body = cfg.blocks[loop.header + 1]
+    latch = cfg.blocks[exit_index - 1]
+    inside_labels = get_back_edge_labels(cfg, loop)
+    back_jump = latch.get_terminator()
+
+    if len(body.labels) == 0 or back_jump == None or back_jump[0] != Instruction.JMP or back_jump[1][0] not in inside_labels:
+        return False
+
+    entry = decaf_cfg.BasicBlock(len(cfg.blocks))
+    entry.labels = [label for label in header.labels if label[0][:-1] not in inside_labels]
+    entry.instructions = [[Instruction.JMP, [inside_labels[0]], 'enter the loop at its condition']]
+
+    header.labels = [label for label in header.labels if label[0][:-1] in inside_labels]
+    header.instructions[-1] = [decaf_absmc.INVERTED_BRANCHES[test[0]], test[1][:-1] + [body.get_label_names()[0]], 'repeat the loop']
+    latch.instructions.pop()
+
+    cfg.blocks[loop.header : exit_index] = [entry] + cfg.blocks[loop.header + 1 : exit_index] + [header]
+    return True
+
+
+#removes code that can never be reached and pure instructions whose temporary result is never read
+#saves count as reads, so this is run after dead saves have been removed
+def remove_dead_code(section : List, stats : OptimizationStats) -> None:
+
+    #entries after a jump or return up to the next label can never execute
+    reachable = True
+    kept = []
+    for instruction_tuple in section:
+        if decaf_absmc.is_label_entry(instruction_tuple):
+            reachable = True
+        if not reachable:
+            stats.removed += 1
+            continue
+        kept.append(instruction_tuple)
+        if instruction_tuple[0] in (Instruction.JMP, Instruction.RET):
+            reachable = False
+
+    #jumps to a label that directly follows them
+    section[:] = [instruction_tuple for index, instruction_tuple in enumerate(kept)
+                  if not (instruction_tuple[0] == Instruction.JMP and jumps_to_next_entry(kept, index))]
+    stats.removed += len(kept) - len(section)
+
+    changed = True
+    while changed:
+
+        live_out = compute_live_temporaries(section)[1]
+
+        dead : Set[int] = set()
+        for index, instruction_tuple in enumerate(section):
+            if instruction_tuple[0] in PURE_INSTRUCTIONS:
+                register = instruction_tuple[1][0]
+                if decaf_regalloc.is_temporary(register) and register not in live_out[index]:
+                    dead.add(index)
+
+        changed = len(dead) > 0
+        stats.removed += len(dead)
+        section[:] = [instruction_tuple for index, instruction_tuple in enumerate(section) if index not in dead]
+
+
+#live temporaries before and after every entry
+#saves_read - whether a save reads its register, which keeps the instructions computing saved values alive
+def compute_live_temporaries(section : List, saves_read : bool = True) -> Tuple[List[Set[str]], List[Set[str]]]:
+
+    successors = decaf_regalloc.compute_successors(section)
+    uses, defs = decaf_regalloc.compute_uses_and_defs(section)
+
+    for index, instruction_tuple in enumerate(section):
+        if saves_read and instruction_tuple[0] == Instruction.SAVE and decaf_regalloc.is_temporary(instruction_tuple[1][0]):
+            uses[index] = {instruction_tuple[1][0]}
+
+    return decaf_regalloc.compute_liveness(successors, uses, defs)
+
+
+def jumps_to_next_entry(section : List, index : int) -> bool:
+    target = section[index][1][-1]
+    for instruction_tuple in section[index + 1:]:
+        if not decaf_absmc.is_label_entry(instruction_tuple):
+            return False
+        if instruction_tuple[0][:-1] == target:
+            return True
+    return False
+
+
+#peephole rules look at the entries starting at index and return the number of entries they replace together with
+#the replacement, or None if they do not apply
+#rules only ever remove reads of registers, so liveness computed before a sweep stays valid for the whole sweep
+PeepholeRule = Callable[[List, int, List[Set[str]]], Optional[Tuple[int, List]]]
+
+
+def is_instruction_at(section : List, index : int, *instructions) -> bool:
+    return index < len(section) and not decaf_absmc.is_label_entry(section[index]) and section[index][0] in instructions
+
+def is_dead_after(register : str, index : int, live_out : List[Set[str]]) -> bool:
+    return decaf_regalloc.is_temporary(register) and register not in live_out[index]
+
+
+#move x, x
+def remove_self_move(section, index, live_out):
+    if is_instruction_at(section, index, Instruction.MOVE) and section[index][1][0] == section[index][1][1]:
+        return (1, [])
+    return None
+
+#op t, ...  move d, t  ->  op d, ...  if t is not read afterwards
+def forward_move_destination(section, index, live_out):
+    if decaf_absmc.is_label_entry(section[index]) or section[index][0] in decaf_absmc.CALLS | {Instruction.RESTORE} or not is_instruction_at(section, index + 1, Instruction.MOVE):
+        return None
+    written = decaf_absmc.get_registers_written(section[index][0], section[index][1])
+    source = section[index + 1][1][1]
+    if written != [source] or not is_dead_after(source, index + 1, live_out):
+        return None
+    instruction, args, comment = section[index]
+    return (2, [[instruction, [section[index + 1][1][0]] + args[1:], comment]])
+
+#pure instructions whose temporary result is never read
+def remove_dead_instruction(section, index, live_out):
+    if is_instruction_at(section, index, *PURE_INSTRUCTIONS) and is_dead_after(section[index][1][0], index, live_out):
+        return (1, [])
+    return None
+
+#jmp L  L:
+def remove_jump_to_next(section, index, live_out):
+    if is_instruction_at(section, index, Instruction.JMP) and jumps_to_next_entry(section, index):
+        return (1, [])
+    return None
+
+#save x  restore x
+def remove_save_restore(section, index, live_out):
+    if is_instruction_at(section, index, Instruction.SAVE) and is_instruction_at(section, index + 1, Instruction.RESTORE) and section[index][1][0] == section[index + 1][1][0]:
+        return (2, [])
+    return None
+
+#bz r, L1  jmp L2  L1:  ->  bnz r, L2  L1:
+def invert_branch_over_jump(section, index, live_out):
+    if not (is_instruction_at(section, index, *decaf_absmc.CONDITIONAL_BRANCHES) and is_instruction_at(section, index + 1, Instruction.JMP)):
+        return None
+    if not jumps_to_next_entry(section[index : index + 1] + section[index + 2:], 0):
+        return None
+    instruction, args, comment = section[index]
+    return (2, [[decaf_absmc.INVERTED_BRANCHES[instruction], args[:-1] + [section[index + 1][1][0]], comment]])
+
+#jmp L  ...  L: jmp M  ->  jmp M
+def thread_jump(section, index, live_out):
+    if not is_instruction_at(section, index, Instruction.JMP):
+        return None
+    target = section[index][1][0]
+    visited = {target}
+    while True:
+        following = find_label_entry(section, target)
+        if following == None:
+            break
+        while following < len(section) and decaf_absmc.is_label_entry(section[following]):
+            following += 1
+        if not is_instruction_at(section, following, Instruction.JMP) or section[following][1][0] in visited:
+            break
+        target = section[following][1][0]
+        visited.add(target)
+    if target == section[index][1][0]:
+        return None
+    return (1, [[Instruction.JMP, [target], section[index][2]]])
+
+def find_label_entry(section : List, label : str) -> Optional[int]:
+    for position, instruction_tuple in enumerate(section):
+        if decaf_absmc.is_label_entry(instruction_tuple) and instruction_tuple[0][:-1] == label:
+            return position
+    return None
+
+
+PEEPHOLE_RULES : Dict[str, PeepholeRule] = {
+    'self-move' : remove_self_move,
+    'forward-move' : forward_move_destination,
+    'dead-instruction' : remove_dead_instruction,
+    'jump-to-next' : remove_jump_to_next,
+    'save-restore' : remove_save_restore,
+    'branch-over-jump' : invert_branch_over_jump,
+    'thread-jump' : thread_jump,
+}
+
+
+#applies the rules over the section until none of them fires any more
+def peephole(section : List, stats : OptimizationStats, rules : Dict[str, PeepholeRule] = PEEPHOLE_RULES) -> None:
+
+    changed = True
+    while changed:
+
+        changed = False
+        live_out = compute_live_temporaries(section)[1]
+        new_section = []
+        index = 0
+
+        while index < len(section):
+
+            for name, rule in rules.items():
+                result = rule(section, index, live_out)
+                if result != None:
+                    break
+
+            if result == None:
+                new_section.append(section[index])
+                index += 1
+                continue
+
+            consumed, replacement = result
+            stats.peephole_hits[name] = stats.peephole_hits.get(name, 0) + 1
+            new_section.extend(replacement)
+            index += consumed
+            changed = True
+
+        section[:] = new_section
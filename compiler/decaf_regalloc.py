@@ -0,0 +1,283 @@
+import decaf_absmc
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+#number of temporary registers the allocator tries to fit a method into
+DEFAULT_REGISTER_BUDGET = 32
+
+
+def is_temporary(register : str) -> bool:
+    return len(register) > 1 and register[0] == 't' and register[1:].isdigit()
+
+def is_argument(register : str) -> bool:
+    return len(register) > 1 and register[0] == 'a' and register[1:].isdigit()
+
+def is_register(register : str) -> bool:
+    return register == 'sap' or is_temporary(register) or is_argument(register)
+
+
+class AllocationStats:
+
+    def __init__(self):
+        self.virtual_registers = 0
+        self.physical_registers = 0
+        #intervals that did not fit into the budget - the AMI has no memory to spill to, so they get registers past it
+        self.over_budget = 0
+
+    def __str__(self):
+        return f'{self.virtual_registers} temporaries -> {self.physical_registers} registers ({self.over_budget} over budget)'
+
+
+#successor indices of every entry of a method section
+def compute_successors(section : List) -> List[List[int]]:
+
+    label_positions : Dict[str, int] = {}
+    for index, instruction_tuple in enumerate(section):
+        if decaf_absmc.is_label_entry(instruction_tuple):
+            label_positions[instruction_tuple[0][:-1]] = index
+
+    successors : List[List[int]] = []
+
+    for index, instruction_tuple in enumerate(section):
+
+        next_index = [index + 1] if index + 1 < len(section) else []
+        instruction = instruction_tuple[0]
+
+        #jumps out of the section never carry temporaries
+        if instruction == decaf_absmc.Instruction.JMP:
+            successors.append([label_positions[instruction_tuple[1][0]]] if instruction_tuple[1][0] in label_positions else [])
+        elif instruction in decaf_absmc.CONDITIONAL_BRANCHES:
+            target = [label_positions[instruction_tuple[1][-1]]] if instruction_tuple[1][-1] in label_positions else []
+            successors.append(next_index + target)
+        elif instruction == decaf_absmc.Instruction.RET:
+            successors.append([])
+        else:
+            successors.append(next_index)
+
+    return successors
+
+
+#registers read and written by every entry - save and restore only preserve values across calls, so they are ignored
+#a call reads the argument registers of its callee (call_arguments gives their number by label, otherwise all
+#argument registers of the section are assumed) and writes the result to a0, ret reads the result in a0
+#a jump out of the section is a tail call, which reads the argument registers of its callee like a call
+#a call through a register reads the register and, as its callee is not known, all argument registers of the section
+def compute_uses_and_defs(section : List, is_tracked : Callable[[str], bool] = is_temporary, call_arguments : Optional[Dict[str, int]] = None) -> Tuple[List[Set[str]], List[Set[str]]]:
+
+    uses : List[Set[str]] = []
+    defs : List[Set[str]] = []
+
+    section_arguments = set()
+    section_labels = set()
+    for instruction_tuple in section:
+        if not decaf_absmc.is_label_entry(instruction_tuple):
+            section_arguments.update(arg for arg in instruction_tuple[1] if isinstance(arg, str) and is_argument(arg))
+        else:
+            section_labels.add(instruction_tuple[0][:-1])
+
+    for instruction_tuple in section:
+
+        instruction = instruction_tuple[0]
+
+        if decaf_absmc.is_label_entry(instruction_tuple) or instruction in (decaf_absmc.Instruction.SAVE, decaf_absmc.Instruction.RESTORE):
+            uses.append(set())
+            defs.append(set())
+            continue
+
+        if instruction in decaf_absmc.CALLS or (instruction == decaf_absmc.Instruction.JMP and instruction_tuple[1][0] not in section_labels):
+            callee = instruction_tuple[1][0]
+            if instruction == decaf_absmc.Instruction.CALLR:
+                read = section_arguments | {callee}
+            elif call_arguments != None and callee in call_arguments:
+                read = {f'a{i}' for i in range(call_arguments[callee])}
+            else:
+                read = set(section_arguments)
+            uses.append({r for r in read if is_tracked(r)})
+            defs.append({r for r in ['a0'] if is_tracked(r) and instruction in decaf_absmc.CALLS})
+            continue
+
+        if instruction == decaf_absmc.Instruction.RET:
+            uses.append({r for r in ['a0'] if is_tracked(r)})
+            defs.append(set())
+            continue
+
+        uses.append({r for r in decaf_absmc.get_registers_read(instruction, instruction_tuple[1]) if is_tracked(r)})
+        defs.append({r for r in decaf_absmc.get_registers_written(instruction, instruction_tuple[1]) if is_tracked(r)})
+
+    return (uses, defs)
+
+
+def compute_liveness(successors : List[List[int]], uses : List[Set[str]], defs : List[Set[str]]) -> Tuple[List[Set[str]], List[Set[str]]]:
+
+    live_in : List[Set[str]] = [set() for i in uses]
+    live_out : List[Set[str]] = [set() for i in uses]
+
+    changed = True
+    while changed:
+        changed = False
+        for index in range(len(uses) - 1, -1, -1):
+
+            out = set()
+            for successor in successors[index]:
+                out |= live_in[successor]
+
+            new_in = uses[index] | (out - defs[index])
+
+            if out != live_out[index] or new_in != live_in[index]:
+                live_out[index] = out
+                live_in[index] = new_in
+                changed = True
+
+    return (live_in, live_out)
+
+
+#live interval of every temporary as the range of positions at which it is live, read or written
+#the flag records whether the interval starts with a definition rather than a live-in value
+def compute_intervals(uses, defs, live_in, live_out) -> Dict[str, List]:
+
+    intervals : Dict[str, List] = {}
+
+    for index in range(len(uses)):
+
+        for register in live_in[index] | live_out[index] | uses[index] | defs[index]:
+
+            if register not in intervals:
+                intervals[register] = [index, index, register not in live_in[index]]
+            else:
+                intervals[register][1] = index
+
+    return intervals
+
+
+def linear_scan(intervals : Dict[str, List], budget : int, stats : AllocationStats) -> Dict[str, str]:
+
+    assignment : Dict[str, int] = {}
+    active : List[Tuple[int, str]] = []
+    free : List[int] = []
+    num_physical = 0
+
+    for register in sorted(intervals, key=lambda r: (intervals[r][0], intervals[r][1])):
+
+        start, end, starts_with_def = intervals[register]
+
+        #a register read for the last time can be reused by the instruction's own result
+        still_active = []
+        for active_end, active_register in active:
+            if active_end < start or (active_end == start and starts_with_def):
+                free.append(assignment[active_register])
+            else:
+                still_active.append((active_end, active_register))
+        active = still_active
+
+        if len(free) > 0:
+            free.sort()
+            assignment[register] = free.pop(0)
+        else:
+            if num_physical >= budget:
+                stats.over_budget += 1
+            assignment[register] = num_physical
+            num_physical += 1
+
+        active.append((end, register))
+
+    stats.physical_registers = num_physical
+
+    return {register : f't{physical}' for register, physical in assignment.items()}
+
+
+#pairs up saves and restores of the same register in the order the machine executes them
+def match_saves_and_restores(section : List) -> List[Tuple[int, int]]:
+
+    pairs : List[Tuple[int, int]] = []
+    pending_saves : List[int] = []
+
+    for index, instruction_tuple in enumerate(section):
+
+        if instruction_tuple[0] == decaf_absmc.Instruction.SAVE:
+            pending_saves.append(index)
+
+        elif instruction_tuple[0] == decaf_absmc.Instruction.RESTORE and len(pending_saves) > 0:
+            save_index = pending_saves.pop()
+            if section[save_index][1][0] == instruction_tuple[1][0]:
+                pairs.append((save_index, index))
+
+    return pairs
+
+
+#rewrites the temporaries of a method section onto a minimal set of registers
+#every save/restore pair is kept - dead ones are removed by remove_dead_saves beforehand, unless all registers are saved.
+#The restore writes the register, so a saved temporary keeps its register from the save to the restore
+def allocate_registers(section : List, budget : int = DEFAULT_REGISTER_BUDGET) -> AllocationStats:
+
+    stats = AllocationStats()
+
+    successors = compute_successors(section)
+    uses, defs = compute_uses_and_defs(section)
+    live_in, live_out = compute_liveness(successors, uses, defs)
+    intervals = compute_intervals(uses, defs, live_in, live_out)
+
+    for save_index, restore_index in match_saves_and_restores(section):
+
+        register = section[save_index][1][0]
+
+        if not is_temporary(register):
+            continue
+
+        if register not in intervals:
+            intervals[register] = [save_index, restore_index, False]
+        else:
+            if save_index < intervals[register][0]:
+                intervals[register][0] = save_index
+                intervals[register][2] = False
+            intervals[register][1] = max(intervals[register][1], restore_index)
+
+    stats.virtual_registers = len(intervals)
+
+    mapping = linear_scan(intervals, budget, stats)
+
+    #unmatched saves and restores of unused temporaries still need a register to keep the stack balanced
+    for instruction_tuple in section:
+        if instruction_tuple[0] in (decaf_absmc.Instruction.SAVE, decaf_absmc.Instruction.RESTORE):
+            register = instruction_tuple[1][0]
+            if is_temporary(register) and register not in mapping:
+                mapping[register] = f't{stats.physical_registers}'
+                stats.physical_registers += 1
+
+    for instruction_tuple in section:
+        if not decaf_absmc.is_label_entry(instruction_tuple):
+            instruction_tuple[1] = [mapping.get(arg, arg) if isinstance(arg, str) and is_temporary(arg) else arg for arg in instruction_tuple[1]]
+
+    return stats
+
+
+#removes every save/restore pair whose register is not read after the restore before being written again
+#a save reads its register, so a pair is also kept when the value it restores is stored by a save that is kept. Pairs are
+#kept starting from the ones whose value is read, so that a save in a loop does not keep its own pair alive
+#returns the number of pairs removed
+def remove_dead_saves(section : List, call_arguments : Optional[Dict[str, int]] = None) -> int:
+
+    successors = compute_successors(section)
+    uses, defs = compute_uses_and_defs(section, is_register, call_arguments)
+    pairs = match_saves_and_restores(section)
+
+    kept : Set[int] = set()
+    changed = True
+
+    while changed:
+
+        changed = False
+        save_uses = list(uses)
+        for save_index, restore_index in pairs:
+            if save_index in kept:
+                save_uses[save_index] = {section[save_index][1][0]}
+
+        live_in, live_out = compute_liveness(successors, save_uses, defs)
+
+        for save_index, restore_index in pairs:
+            if save_index not in kept and section[restore_index][1][0] in live_out[restore_index]:
+                kept.add(save_index)
+                changed = True
+
+    removed = {index for pair in pairs if pair[0] not in kept for index in pair}
+    section[:] = [instruction_tuple for index, instruction_tuple in enumerate(section) if index not in removed]
+
+    return len(removed) // 2
@@ -1,8 +1,11 @@
 import decaf_ast
 from enum import Enum
+from typing import Dict
 
 
 
+#class types are interned - there is one object per class name, so types compare by identity and can be dict keys
+#use get_class_literal_type/get_class_object_type instead of the constructors
 class ClassLiteralType:
     
     def __init__(self, class_name : str):
@@ -10,12 +13,6 @@ class ClassLiteralType:
         
     def get_class_name(self):
         return self.class_name
-    
-    def __eq__(self, other):
-        if isinstance(other, ClassLiteralType):
-            return other.class_name == self.class_name
-        
-        return False
         
     def __str__(self):
         return f'class-literal({self.class_name})'
@@ -28,16 +25,30 @@ class ClassObjectType:
         
     def get_class_name(self):
         return self.class_name
-    
-    def __eq__(self, other):
-        if isinstance(other, ClassObjectType):
-            return other.class_name == self.class_name
-        
-        return False
         
     def __str__(self):
         return f'user({self.class_name})'
 
+
+class_literal_types : Dict[str, ClassLiteralType] = {}
+class_object_types : Dict[str, ClassObjectType] = {}
+
+
+def get_class_literal_type(class_name : str) -> ClassLiteralType:
+    
+    if class_name not in class_literal_types:
+        class_literal_types[class_name] = ClassLiteralType(class_name)
+    
+    return class_literal_types[class_name]
+
+
+def get_class_object_type(class_name : str) -> ClassObjectType:
+    
+    if class_name not in class_object_types:
+        class_object_types[class_name] = ClassObjectType(class_name)
+    
+    return class_object_types[class_name]
+
 class BaseType(Enum):
     INT = 'int'
     BOOL = 'boolean'
@@ -65,7 +76,7 @@ def is_subtype(a : str, b : str, ast):
         return True
     
     if isinstance(a, ClassObjectType) and isinstance(b, ClassObjectType):
-        return ast.is_subclass(a.get_class_name(), b.get_class_name) 
+        return ast.is_subclass(a.get_class_name(), b.get_class_name())
 
     if isinstance(a, ClassLiteralType) and isinstance(b, ClassLiteralType):
         return ast.is_subclass(a.get_class_name(), b.get_class_name())
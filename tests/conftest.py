@@ -0,0 +1,7 @@
+import os
+import sys
+
+#the compiler and the assembler are run as scripts from their own directories, so their modules import each other by name
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'compiler'))
+sys.path.insert(0, os.path.join(ROOT, 'assembler'))
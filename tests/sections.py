@@ -0,0 +1,30 @@
+import decaf_absmc
+from typing import List
+
+#helpers for the tests of the compiler passes, which work on method sections: lists of [instruction, args, comment]
+#entries, where a label is an entry whose instruction is its name followed by a colon
+
+
+#one instruction or label per line, written as in an AMI file
+def parse_section(text : str) -> List:
+
+    section = []
+
+    for line in text.splitlines():
+
+        line = line.split('#')[0].strip()
+
+        if len(line) == 0:
+            continue
+        if line.endswith(':'):
+            section.append([line, [], ''])
+            continue
+
+        name, _, operands = line.partition(' ')
+        section.append([decaf_absmc.Instruction(name), [operand.strip() for operand in operands.split(',') if operand.strip() != ''], ''])
+
+    return section
+
+
+def format_section(section : List) -> List[str]:
+    return [entry[0] if decaf_absmc.is_label_entry(entry) else f'{entry[0].value} {", ".join(entry[1])}'.strip() for entry in section]
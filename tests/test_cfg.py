@@ -0,0 +1,81 @@
+import decaf_cfg
+from sections import parse_section, format_section
+
+
+#two nested for loops as the code generator emits them, before they are rotated
+NESTED_LOOPS = """
+    move_immed_i t0, 0
+    outer_cond:
+    move_immed_i t2, 10
+    bgeq t0, t2, outer_end
+    move_immed_i t1, 0
+    inner_cond:
+    bgeq t1, t2, inner_end
+    iwrite t1
+    iaddi t1, t1, 1
+    jmp inner_cond
+    inner_end:
+    iaddi t0, t0, 1
+    jmp outer_cond
+    outer_end:
+    ret
+"""
+
+
+def build(text):
+    return decaf_cfg.ControlFlowGraph(parse_section(text))
+
+def block_of(cfg, label):
+    return cfg.label_to_block[label]
+
+
+def test_basic_blocks():
+    cfg = build(NESTED_LOOPS)
+
+    #entry, outer test, inner init, inner test, inner body, inner end, outer end
+    assert len(cfg.blocks) == 7
+    assert cfg.blocks[block_of(cfg, 'inner_cond')].successors == [4, block_of(cfg, 'inner_end')]
+    assert cfg.blocks[block_of(cfg, 'outer_end')].successors == []
+    assert sorted(cfg.blocks[block_of(cfg, 'outer_cond')].predecessors) == [0, block_of(cfg, 'inner_end')]
+
+
+def test_to_section_gives_back_the_section():
+    section = parse_section(NESTED_LOOPS)
+    assert format_section(decaf_cfg.ControlFlowGraph(section).to_section()) == format_section(section)
+
+
+def test_dominators():
+    cfg = build(NESTED_LOOPS)
+    outer, inner = block_of(cfg, 'outer_cond'), block_of(cfg, 'inner_cond')
+
+    assert cfg.blocks[0].immediate_dominator == None
+    assert cfg.blocks[outer].immediate_dominator == 0
+    assert cfg.blocks[block_of(cfg, 'inner_end')].immediate_dominator == inner
+    assert cfg.blocks[block_of(cfg, 'outer_end')].immediate_dominator == outer
+    assert cfg.dominates(outer, inner) and not cfg.dominates(inner, outer)
+
+
+def test_nested_natural_loops():
+    cfg = build(NESTED_LOOPS)
+    outer, inner = block_of(cfg, 'outer_cond'), block_of(cfg, 'inner_cond')
+
+    assert [loop.header for loop in cfg.loops] == [outer, inner]
+    outer_loop, inner_loop = cfg.loops
+
+    assert inner_loop.parent is outer_loop and inner_loop.depth == 2 and outer_loop.depth == 1
+    assert inner_loop.body == {inner, 4}
+    assert outer_loop.body == {outer, 2, inner, 4, block_of(cfg, 'inner_end')}
+    assert inner_loop.get_exits(cfg) == [block_of(cfg, 'inner_end')]
+    assert outer_loop.get_exits(cfg) == [block_of(cfg, 'outer_end')]
+    assert cfg.blocks[4].loop is inner_loop
+
+
+def test_unreachable_block_is_not_a_loop():
+    cfg = build("""
+        ret
+        dead:
+        jmp dead
+    """)
+
+    assert not cfg.is_reachable(block_of(cfg, 'dead'))
+    assert cfg.loops == []
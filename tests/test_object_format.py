@@ -0,0 +1,48 @@
+import io
+import pytest
+import decaf_absmc
+import ami_format
+from decaf_absmc import Instruction
+
+#the compiler, the assembler and ami_object.py all take the instruction set and the object format from
+#assembler/ami_format.py
+
+
+def test_instructions_are_the_opcodes():
+    assert [instruction.value for instruction in Instruction] == ami_format.OPCODE_NAMES
+
+
+def test_operand_kinds_of_instructions():
+    assert decaf_absmc.get_operand_kinds(Instruction.HSTOREI) == 'rir'
+    assert decaf_absmc.get_operand_kinds(Instruction.IADD) == 'rrr'
+
+
+@pytest.mark.parametrize('register', ['sap', 'a0', 'a1', 't0', 't1', 'a17', 't42'])
+def test_register_encoding_round_trip(register):
+    assert ami_format.decode_register(ami_format.encode_register(register)) == register
+
+
+#the compiler writes immediates as strings, the decoded program has them as numbers
+def test_compiler_object_file_round_trip():
+    program = decaf_absmc.AbstractProgram()
+    program.set_size_static_section(2)
+    program.create_label_group('Main', '')
+    program.create_labeled_section('M_main_1', 'Main')
+    program.append_instruction_to_labeled_section('M_main_1', [Instruction.MOVE_IMMED_I, ['t0', '7'], ''])
+    program.append_instruction_to_labeled_section('M_main_1', [Instruction.MOVE_IMMED_F, ['t1', '1.5'], ''])
+    program.append_instruction_to_labeled_section('M_main_1', [Instruction.HSTOREI, ['sap', '1', 't0'], ''])
+    program.append_instruction_to_labeled_section('M_main_1', [Instruction.JMP, ['M_main_1'], ''])
+
+    file = io.BytesIO()
+    program.write_object_file(file)
+
+    assert ami_format.decode_program(file.getvalue()) == {
+        'labels' : {'M_main_1' : 0},
+        'basic_blocks' : [[['move_immed_i', 't0', 7], ['move_immed_f', 't1', 1.5], ['hstorei', 'sap', 1, 't0'], ['jmp', 'M_main_1']]],
+        '.static_data' : 2,
+    }
+
+
+def test_undefined_label():
+    with pytest.raises(ami_format.ObjectFormatError):
+        ami_format.encode_program({'labels' : {}, 'basic_blocks' : [[['jmp', 'nowhere']]], '.static_data' : 0})
@@ -0,0 +1,251 @@
+import pytest
+import decaf_optimize
+from sections import parse_section, format_section
+
+
+#a loop as the code generator emits it, with the condition at the top and a call whose saves are already pruned
+LOOP_WITH_CALL = """
+    move_immed_i t0, 6
+    move_immed_i t1, 0
+    loop_cond:
+    move_immed_i t4, 10
+    bgeq t1, t4, loop_end
+    loop_body:
+    move_immed_i t5, 3
+    imul t2, t0, t5
+    save t0
+    save t1
+    save t2
+    move a0, t1
+    call M_g_2
+    restore t2
+    restore t1
+    restore t0
+    iadd t3, a0, t2
+    iwrite t3
+    iaddi t1, t1, 1
+    jmp loop_cond
+    loop_end:
+    ret
+"""
+
+
+def hoist(text):
+    section = parse_section(text)
+    stats = decaf_optimize.OptimizationStats()
+    decaf_optimize.hoist_loop_invariants(section, stats)
+    return format_section(section), stats
+
+
+#the restores around the call put back t0 and t2, they do not redefine them
+def test_hoist_out_of_loop_with_call():
+    lines, stats = hoist(LOOP_WITH_CALL)
+    preheader = lines[:lines.index('loop_cond:')]
+
+    assert 'imul t2, t0, t5' in preheader
+    assert stats.hoisted == 2
+
+
+#t5 is only read by the hoisted multiplication, so it does not need to survive the call - t4 is read by the loop test
+#after the call, where it is not saved, so it stays
+def test_hoist_keeps_values_clobbered_by_call():
+    lines, stats = hoist(LOOP_WITH_CALL)
+    preheader = lines[:lines.index('loop_cond:')]
+
+    assert 'move_immed_i t5, 3' in preheader
+    assert 'move_immed_i t4, 10' not in preheader
+    assert 'move_immed_i t4, 10' in lines
+
+
+#t2 is written twice in the loop, and with the multiplication staying in the loop t5 is read there across the call
+def test_hoist_keeps_values_defined_twice():
+    lines, stats = hoist(LOOP_WITH_CALL.replace('iaddi t1, t1, 1', 'iaddi t1, t1, 1\n    move_immed_i t2, 1'))
+
+    assert lines.index('imul t2, t0, t5') > lines.index('loop_cond:')
+    assert stats.hoisted == 0
+
+
+def number(text):
+    section = parse_section(text)
+    stats = decaf_optimize.OptimizationStats()
+    decaf_optimize.number_values(section, stats)
+    return format_section(section), stats
+
+
+#operands of commutative operations are numbered in either order, and reads of the copy go to the first holder
+def test_number_values_reuses_commutative_operation():
+    lines, stats = number("""
+        move_immed_i t0, 2
+        iadd t1, a0, t0
+        iadd t2, t0, a0
+        iwrite t2
+        ret
+    """)
+
+    assert lines == ['move_immed_i t0, 2', 'iadd t1, a0, t0', 'move t2, t1', 'iwrite t1', 'ret']
+    assert stats.reused == 1
+
+
+def test_number_values_keeps_operand_order_of_subtraction():
+    lines, stats = number("""
+        move_immed_i t0, 2
+        isub t1, a0, t0
+        isub t2, t0, a0
+        iwrite t2
+        ret
+    """)
+
+    assert 'isub t2, t0, a0' in lines
+    assert stats.reused == 0
+
+
+#a copy holds the same value as its source
+def test_number_values_follows_moves():
+    lines, stats = number("""
+        move t0, a0
+        iaddi t1, a0, 1
+        iaddi t2, t0, 1
+        iwrite t2
+        ret
+    """)
+
+    assert lines[2:4] == ['move t2, t1', 'iwrite t1']
+    assert stats.reused == 1
+
+
+#a call may change every register, and values are only numbered within a basic block
+@pytest.mark.parametrize('separator', ['call M_f_1', 'jmp next\n next:'])
+def test_number_values_forgets_values(separator):
+    lines, stats = number(f"""
+        move_immed_i t0, 2
+        iadd t1, a0, t0
+        {separator}
+        iadd t2, a0, t0
+        iwrite t2
+        ret
+    """)
+
+    assert 'iadd t2, a0, t0' in lines
+    assert stats.reused == 0
+
+
+#a field that was just loaded or stored is read from the register holding it
+def test_number_values_forwards_loads_and_stores():
+    lines, stats = number("""
+        hloadi t0, a0, 1
+        hloadi t1, a0, 1
+        iwrite t1
+        hstorei a0, 2, t0
+        hloadi t2, a0, 2
+        iwrite t2
+        ret
+    """)
+
+    assert lines == ['hloadi t0, a0, 1', 'move t1, t0', 'iwrite t0', 'hstorei a0, 2, t0', 'move t2, t0', 'iwrite t0', 'ret']
+    assert stats.loads_removed == 2
+
+
+#a1 may point to the same object as a0, so only a store to a different field keeps the loaded value
+def test_number_values_stores_through_other_registers():
+    lines, stats = number("""
+        hloadi t0, a0, 1
+        hstorei a1, 2, t3
+        hloadi t1, a0, 1
+        hstorei a1, 1, t3
+        hloadi t2, a0, 1
+        iwrite t2
+        ret
+    """)
+
+    assert lines[2] == 'move t1, t0'
+    assert 'hloadi t2, a0, 1' in lines
+    assert stats.loads_removed == 1
+
+
+#the called method may store to the field, and a loaded value is only reused while a register still holds it
+@pytest.mark.parametrize('separator', ['call M_f_1', 'move_immed_i t0, 0'])
+def test_number_values_reloads_fields(separator):
+    lines, stats = number(f"""
+        hloadi t0, a0, 1
+        {separator}
+        hloadi t1, a0, 1
+        iwrite t1
+        ret
+    """)
+
+    assert 'hloadi t1, a0, 1' in lines
+    assert stats.loads_removed == 0
+
+
+def peephole(text, rules = decaf_optimize.PEEPHOLE_RULES):
+    section = parse_section(text)
+    stats = decaf_optimize.OptimizationStats()
+    decaf_optimize.peephole(section, stats, rules)
+    return format_section(section), stats
+
+
+#one section for every rule, with the code it should leave behind
+PEEPHOLE_CASES = {
+    'self-move' : ("""
+        move t0, t0
+        iwrite t0
+        ret
+    """, ['iwrite t0', 'ret']),
+    'forward-move' : ("""
+        iadd t1, a0, a1
+        move a0, t1
+        ret
+    """, ['iadd a0, a0, a1', 'ret']),
+    'dead-instruction' : ("""
+        move_immed_i t0, 1
+        move_immed_i t1, 2
+        iwrite t0
+        ret
+    """, ['move_immed_i t0, 1', 'iwrite t0', 'ret']),
+    'jump-to-next' : ("""
+        jmp next
+        other:
+        next:
+        ret
+    """, ['other:', 'next:', 'ret']),
+    'save-restore' : ("""
+        save t0
+        restore t0
+        iwrite t0
+        ret
+    """, ['iwrite t0', 'ret']),
+    'branch-over-jump' : ("""
+        bz a0, skip
+        jmp away
+        skip:
+        iwrite a0
+        away:
+        ret
+    """, ['bnz a0, away', 'skip:', 'iwrite a0', 'away:', 'ret']),
+    'thread-jump' : ("""
+        jmp first
+        iwrite a0
+        first:
+        jmp second
+        second:
+        ret
+    """, ['jmp second', 'iwrite a0', 'first:', 'second:', 'ret']),
+}
+
+
+@pytest.mark.parametrize('rule', decaf_optimize.PEEPHOLE_RULES.keys())
+def test_peephole_rule(rule):
+    text, expected = PEEPHOLE_CASES[rule]
+    lines, stats = peephole(text)
+
+    assert lines == expected
+    assert stats.peephole_hits.get(rule, 0) > 0
+
+
+#only the rules passed in are applied
+def test_peephole_with_selected_rules():
+    text, expected = PEEPHOLE_CASES['forward-move']
+    lines, stats = peephole(text, {'self-move' : decaf_optimize.remove_self_move})
+
+    assert lines == format_section(parse_section(text))
+    assert stats.peephole_hits == {}
@@ -0,0 +1,134 @@
+import os
+import sys
+import json
+import subprocess
+import pytest
+
+#end-to-end tests - each sample program is compiled, assembled and run, and its output compared to programs/<name>.expected
+#a program that is meant to stop with a machine error has the expected message in programs/<name>.error
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMPILER_DIR = os.path.join(ROOT, 'compiler')
+ASSEMBLER_DIR = os.path.join(ROOT, 'assembler')
+PROGRAMS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'programs')
+
+PROGRAMS = sorted(file_name[:-6] for file_name in os.listdir(PROGRAMS_DIR) if file_name.endswith('.decaf'))
+ENGINES = ['reference', 'closure', 'compiled']
+
+FLAG_SETS = {
+    'default' : [],
+    'unoptimized' : ['--no-optimize', '--no-inline', '--no-register-allocation'],
+}
+
+
+def run_tool(directory, script, args, timeout = 120) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, script] + args, cwd=directory, capture_output=True, text=True, timeout=timeout)
+
+def check_tool(directory, script, args, timeout = 120) -> str:
+    result = run_tool(directory, script, args, timeout)
+    assert result.returncode == 0, result.stderr
+    return result.stdout
+
+#copies the program into tmp_path and compiles it there, returns the path of the output file
+def compile_program(name, tmp_path, flags = [], binary = False):
+    source = os.path.join(tmp_path, f'{name}.decaf')
+    with open(os.path.join(PROGRAMS_DIR, f'{name}.decaf'), 'r') as infile, open(source, 'w') as outfile:
+        outfile.write(infile.read())
+
+    check_tool(COMPILER_DIR, 'decaf_compiler.py', ['--infile', source] + flags + (['--binary'] if binary else []))
+    return os.path.join(tmp_path, f'{name}.amo' if binary else f'{name}.ami')
+
+#runs the program and checks its output, and that it fails only with its expected error
+def check_program(name, file_name, engine = 'closure'):
+    result = run_tool(ASSEMBLER_DIR, 'ami_machine.py', ['--infile', file_name, '--engine', engine])
+    error_file = os.path.join(PROGRAMS_DIR, f'{name}.error')
+
+    if os.path.exists(error_file):
+        with open(error_file, 'r') as infile:
+            assert result.returncode != 0 and infile.read().strip() in result.stderr, result.stderr
+    else:
+        assert result.returncode == 0, result.stderr
+
+    assert result.stdout == expected_output(name)
+
+def convert(infile, outfile):
+    check_tool(ASSEMBLER_DIR, 'ami_object.py', ['--infile', infile, '--outfile', outfile])
+    return outfile
+
+def expected_output(name):
+    with open(os.path.join(PROGRAMS_DIR, f'{name}.expected'), 'r') as infile:
+        return infile.read()
+
+
+@pytest.mark.parametrize('flags', FLAG_SETS.keys())
+@pytest.mark.parametrize('name', PROGRAMS)
+def test_program_output(name, flags, tmp_path):
+    program = compile_program(name, str(tmp_path), FLAG_SETS[flags])
+    check_program(name, program)
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('name', PROGRAMS)
+def test_engines_agree(name, engine, tmp_path):
+    program = compile_program(name, str(tmp_path))
+    check_program(name, program, engine)
+
+
+@pytest.mark.parametrize('name', PROGRAMS)
+def test_binary_output(name, tmp_path):
+    program = compile_program(name, str(tmp_path), binary=True)
+    check_program(name, program)
+
+
+#text -> amo -> text gives back the same assembled program
+@pytest.mark.parametrize('name', PROGRAMS)
+def test_object_file_round_trip(name, tmp_path):
+    tmp_path = str(tmp_path)
+    program = compile_program(name, tmp_path)
+
+    object_file = convert(program, os.path.join(tmp_path, 'program.amo'))
+    text_file = convert(object_file, os.path.join(tmp_path, 'round_trip.ami'))
+
+    with open(convert(program, os.path.join(tmp_path, 'original.json')), 'r') as infile:
+        original = json.load(infile)
+    with open(convert(text_file, os.path.join(tmp_path, 'round_trip.json')), 'r') as infile:
+        round_trip = json.load(infile)
+
+    assert round_trip == original
+    check_program(name, text_file)
+
+
+#each method calls the next one twice, so inlining bodies into inlined bodies without a limit grows the code exponentially
+#with the length of the chain
+def test_inlining_growth_is_bounded(tmp_path):
+    tmp_path = str(tmp_path)
+    depth = 14
+
+    methods = [f'    public static int m{i}(int x) {{ return A.m{i + 1}(x) + A.m{i + 1}(x + 1); }}\n' for i in range(depth)]
+    methods.append(f'    public static int m{depth}(int x) {{ return x; }}\n')
+
+    source = os.path.join(tmp_path, 'chain.decaf')
+    with open(source, 'w') as outfile:
+        outfile.write('class A {\n' + ''.join(methods) + '}\nclass Main {\n    public static void main() {\n        Out.print(A.m0(1));\n    }\n}\n')
+
+    lines = {}
+    for name, flags in (('inlined', []), ('not inlined', ['--no-inline'])):
+        check_tool(COMPILER_DIR, 'decaf_compiler.py', ['--infile', source] + flags, timeout=60)
+        with open(os.path.join(tmp_path, 'chain.ami'), 'r') as infile:
+            lines[name] = len(infile.readlines())
+        assert check_tool(ASSEMBLER_DIR, 'ami_machine.py', ['--infile', os.path.join(tmp_path, 'chain.ami')]) == f'{2 ** depth + depth * 2 ** (depth - 1)}\n'
+
+    assert lines['inlined'] < 16 * lines['not inlined']
+
+
+#the method tables are filled in by _start - entering at main leaves them empty, and a dispatched call must stop the machine
+#instead of running whatever code is at address 0
+@pytest.mark.parametrize('engine', ENGINES)
+def test_dispatch_through_empty_method_table(engine, tmp_path):
+    program = compile_program('virtual', str(tmp_path))
+
+    with open(program, 'r') as infile:
+        main_label = next(line.split(':')[0] for line in infile if line.startswith('M_main_'))
+
+    result = run_tool(ASSEMBLER_DIR, 'ami_machine.py', ['--infile', program, '--engine', engine, '--entry', main_label])
+    assert result.returncode != 0 and 'invalid code address 0' in result.stderr
@@ -0,0 +1,151 @@
+import decaf_regalloc
+from sections import parse_section, format_section
+
+
+def remove_dead_saves(text):
+    section = parse_section(text)
+    removed = decaf_regalloc.remove_dead_saves(section)
+    return format_section(section), removed
+
+
+def test_remove_dead_saves_keeps_live_values():
+    lines, removed = remove_dead_saves("""
+        move_immed_i t0, 1
+        move_immed_i t1, 2
+        save t0
+        save t1
+        call M_f_1
+        restore t1
+        restore t0
+        iwrite t0
+        ret
+    """)
+
+    assert removed == 1
+    assert 'save t0' in lines and 'save t1' not in lines and 'restore t1' not in lines
+
+
+#the pair around the first call looks dead as a0 is written before it is read, but the second save stores that value
+def test_remove_dead_saves_keeps_values_stored_by_later_saves():
+    lines, removed = remove_dead_saves("""
+        save a0
+        move_immed_i a0, 1
+        call M_f_1
+        restore a0
+        save a0
+        move_immed_i a0, 2
+        call M_f_1
+        restore a0
+        iwrite a0
+        ret
+    """)
+
+    assert removed == 0
+
+
+#the save at the top of the loop reads t0, but that alone must not keep its own pair alive around the back edge
+def test_remove_dead_saves_in_loop():
+    lines, removed = remove_dead_saves("""
+        move_immed_i t0, 0
+        loop:
+        save t0
+        call M_f_1
+        restore t0
+        iwrite a0
+        bnz a0, loop
+        ret
+    """)
+
+    assert removed == 1
+    assert 'save t0' not in lines
+
+
+#with every register saved, a pair whose value is dead is kept, and the restore must not write the register holding the
+#result of the call
+def test_allocate_registers_keeps_saves():
+    section = parse_section("""
+        move_immed_i t5, 1
+        iwrite t5
+        save t5
+        call M_f_1
+        move t9, a0
+        restore t5
+        iwrite t9
+        ret
+    """)
+    decaf_regalloc.allocate_registers(section)
+    lines = format_section(section)
+
+    saved = lines[2].split(' ')[1]
+    result = lines[4].split(' ')[1].rstrip(',')
+
+    assert lines[2] == f'save {saved}' and lines[5] == f'restore {saved}'
+    assert result != saved
+    assert lines[6] == f'iwrite {result}'
+
+
+def allocate(text, budget = decaf_regalloc.DEFAULT_REGISTER_BUDGET):
+    section = parse_section(text)
+    stats = decaf_regalloc.allocate_registers(section, budget)
+    return format_section(section), stats
+
+
+#a register read for the last time is reused by the result of the same instruction
+def test_allocate_registers_reuses_dead_registers():
+    lines, stats = allocate("""
+        move_immed_i t3, 1
+        iaddi t7, t3, 1
+        iaddi t9, t7, 2
+        iwrite t9
+        ret
+    """)
+
+    assert lines == ['move_immed_i t0, 1', 'iaddi t0, t0, 1', 'iaddi t0, t0, 2', 'iwrite t0', 'ret']
+    assert stats.virtual_registers == 3 and stats.physical_registers == 1
+
+
+#t3 is still read after the addition, so the result must not overwrite it
+def test_allocate_registers_keeps_live_registers_apart():
+    lines, stats = allocate("""
+        move_immed_i t3, 1
+        move_immed_i t7, 2
+        iadd t9, t3, t7
+        iwrite t9
+        iwrite t3
+        ret
+    """)
+
+    assert lines[2:5] == ['iadd t1, t0, t1', 'iwrite t1', 'iwrite t0']
+    assert stats.physical_registers == 2
+
+
+#t3 and t4 are live around the back edge, so the temporary of the loop body cannot share their registers
+def test_allocate_registers_in_loop():
+    lines, stats = allocate("""
+        move_immed_i t3, 0
+        move_immed_i t4, 5
+        loop:
+        iwrite t3
+        move_immed_i t8, 7
+        iwrite t8
+        iaddi t3, t3, 1
+        blt t3, t4, loop
+        ret
+    """)
+
+    assert lines[4:8] == ['move_immed_i t2, 7', 'iwrite t2', 'iaddi t0, t0, 1', 'blt t0, t1, loop']
+    assert stats.physical_registers == 3
+
+
+#the machine has no memory to spill to, so intervals past the budget still get registers
+def test_allocate_registers_over_budget():
+    lines, stats = allocate("""
+        move_immed_i t3, 1
+        move_immed_i t7, 2
+        iadd t9, t3, t7
+        iwrite t9
+        iwrite t3
+        ret
+    """, 1)
+
+    assert stats.physical_registers == 2 and stats.over_budget == 1